@@ -0,0 +1,24 @@
+import json
+import sys
+from pathlib import Path
+from jinja2 import Environment, FileSystemLoader
+
+# build_slides1.py --thumbs が作った thumbs/<PDF名>/manifest.json から一覧ページを作る
+#   python contactsheet.py /path/to/講義フォルダ/thumbs/01_xxx_pr
+
+template_dir = Path(__file__).resolve().parent
+template_file = 'contact_sheet.html'
+
+
+def render(thumb_dir: Path) -> Path:
+    manifest = json.loads((thumb_dir / 'manifest.json').read_text(encoding='utf-8'))
+    env = Environment(loader=FileSystemLoader(template_dir))
+    html_output = env.get_template(template_file).render(manifest=manifest)
+    output_file = thumb_dir / 'index.html'
+    output_file.write_text(html_output, encoding='utf-8')
+    return output_file
+
+
+if __name__ == '__main__':
+    for arg in sys.argv[1:]:
+        print("✅ HTMLファイルを生成しました →", render(Path(arg)))
@@ -4,11 +4,9 @@ from pathlib import Path
 
 def getmacro():
     currpath=Path(__file__).parent
-    empath=(currpath.parent.parent)/'build/emoji_macros.tex'
-    latex_commands=""
-    with empath.open(encoding="utf-8") as f:
-        for line in f:
-            latex_commands+=line
+    # ビルドで使っているマクロ表そのもの（templates/emoji_macros.tex）を読む
+    empath=(currpath.parent.parent)/'templates/emoji_macros.tex'
+    latex_commands=empath.read_text(encoding="utf-8")
 
 
     # 正規表現で抽出
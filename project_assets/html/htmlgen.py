@@ -1,26 +1,68 @@
 from pathlib import Path
 from jinja2 import Environment, FileSystemLoader
+from PIL import Image
 import convert
 
-# ベースパス（注意：file:/// はPathには不要）
-base_path = Path('/Volumes/NBPlan/TTC/build_slide/project_assets/emoji/emoji_pngs/')
-template_dir = base_path.parent.parent / 'html'
+# パスはこのファイルの位置から求める（どのマシンでも動くように）
+template_dir = Path(__file__).resolve().parent
+base_path = template_dir.parent / 'emoji' / 'emoji_pngs'
+thumb_dir = template_dir / 'thumbs'
 template_file = 'template.html'  # ファイル名だけ
 
 output_file = template_dir / 'output.html'
 
-# データ読み込み
-image_data = convert.getmacro()
+# サムネイルの一辺（表示は 40px なので高解像度ディスプレイ向けに 2 倍）
+THUMB_SIZE = 80
 
-# テンプレート環境設定（テンプレートのあるディレクトリを指定）
-env = Environment(loader=FileSystemLoader(template_dir))
-template = env.get_template(template_file)  # ← ここはstr型！
 
-# HTMLレンダリング
-html_output = template.render(images=image_data, base_path=(str(base_path)+"/"))
+def make_thumbnail(src: Path, dst: Path) -> bool:
+    """
+    src の縮小画像を dst に作る。dst が src より新しければ作り直さない。
+    作成した場合は True を返す。
+    """
+    if dst.exists() and dst.stat().st_mtime >= src.stat().st_mtime:
+        return False
+    with Image.open(src) as im:
+        im.thumbnail((THUMB_SIZE, THUMB_SIZE))
+        tmp = dst.with_suffix('.tmp.png')
+        im.save(tmp, optimize=True)
+    tmp.replace(dst)
+    return True
 
-# 保存
-with open(output_file, 'w', encoding='utf-8') as f:
-    f.write(html_output)
 
-print("✅ HTMLファイルを生成しました →", output_file)
\ No newline at end of file
+def main():
+    # データ読み込み
+    image_data = convert.getmacro()
+
+    # サムネイル作成（変更された PNG だけ）
+    thumb_dir.mkdir(exist_ok=True)
+    made = 0
+    for item in image_data:
+        src = base_path / item['src']
+        if not src.exists():
+            print("⚠️ 画像が見つかりません:", src)
+            continue
+        if make_thumbnail(src, thumb_dir / item['src']):
+            made += 1
+
+    # テンプレート環境設定（テンプレートのあるディレクトリを指定）
+    env = Environment(loader=FileSystemLoader(template_dir))
+    template = env.get_template(template_file)  # ← ここはstr型！
+
+    # HTMLレンダリング（output.html からの相対パスで参照する）
+    html_output = template.render(
+        images=image_data,
+        base_path=thumb_dir.relative_to(template_dir).as_posix() + "/",
+        full_path=Path('..', 'emoji', 'emoji_pngs').as_posix() + "/",
+        thumb_size=THUMB_SIZE // 2,
+    )
+
+    # 保存
+    output_file.write_text(html_output, encoding='utf-8')
+
+    print(f"✅ サムネイル更新: {made} / {len(image_data)}")
+    print("✅ HTMLファイルを生成しました →", output_file)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+# beamernav.py — beamer の .nav ファイルからフレームとページの対応を読む
+#
+# lualatex が書き出す main.nav には、フレームごとに次のような行が入る。
+#   \headcommand {\beamer@framepages {2}{4}}
+# これは「このフレームは PDF の 2〜4 ページ（オーバーレイ3枚）」という意味。
+#
+# .nav にはマクロが追加したフレーム（\AtBeginSection の中扉、教師用の奇数ページ合わせ、
+# \teacherframe など）も並ぶので、content.tex のフレームとの対応は mark_frames() で本文の各フレームの
+# 末尾に入れた印から求める。印は LuaTeX から frame_marks.tsv に「フレーム番号<TAB>ページ」で書かれる。
+from __future__ import annotations
+
+import re
+from pathlib import Path
+
+_FRAMEPAGES_RE = re.compile(r"\\beamer@framepages\s*\{(\d+)\}\{(\d+)\}")
+_DOCPAGES_RE = re.compile(r"\\beamer@documentpages\s*\{(\d+)\}")
+
+
+def frame_pages(nav_path: Path) -> list[tuple[int, int]]:
+    """
+    .nav からフレームごとの (先頭ページ, 最終ページ) を文書順に返す。ページは1始まり。
+    表紙もフレームの1つとして先頭に含まれる。
+    """
+    text = nav_path.read_text(encoding="utf-8", errors="replace")
+    return [(int(a), int(b)) for a, b in _FRAMEPAGES_RE.findall(text)]
+
+
+def document_pages(nav_path: Path) -> int:
+    """.nav に記録された総ページ数（見つからなければ 0）"""
+    text = nav_path.read_text(encoding="utf-8", errors="replace")
+    m = _DOCPAGES_RE.search(text)
+    return int(m.group(1)) if m else 0
+
+
+MARKS_FILE = "frame_marks.tsv"
+
+
+def _mark(i: int) -> str:
+    # オーバーレイごとに実行されるので、最後の行がフレームの最終ページになる
+    return (rf'\directlua{{build_slide_marks = build_slide_marks or io.open("{MARKS_FILE}", "w") '
+            rf'build_slide_marks:write("{i}", string.char(9), tex.count["c@page"], string.char(10)) '
+            rf'build_slide_marks:flush()}}')
+
+
+def mark_frames(body: str, positions: list[tuple[int, int]]) -> str:
+    """
+    body の各フレーム（positions は find_frame_positions(body) の結果）の \\end{frame} の直前に印を入れる。
+    フレーム番号は 1 始まり。[fragile] のフレームのため \\end{frame} は行頭に置く。
+    """
+    end = r"\end{frame}"
+    parts, prev = [], 0
+    for i, (_a, b) in enumerate(positions, 1):
+        e = b - len(end)
+        parts.append(body[prev:e])
+        parts.append(("" if body[e - 1:e] == "\n" else "\n") + _mark(i) + "\n")
+        prev = e
+    parts.append(body[prev:])
+    return "".join(parts)
+
+
+def read_marks(build_dir: Path) -> dict[int, int]:
+    """frame_marks.tsv を {フレーム番号: 最終ページ} で返す"""
+    tsv = build_dir / MARKS_FILE
+    marks: dict[int, int] = {}
+    if not tsv.exists(): return marks
+    for line in tsv.read_text(encoding="utf-8").splitlines():
+        cols = line.split("\t")
+        if len(cols) != 2: continue
+        marks[int(cols[0])] = max(marks.get(int(cols[0]), 0), int(cols[1]))
+    return marks
+
+
+def match_frames(pages: list[tuple[int, int]], marks: dict[int, int]) -> list[int | None]:
+    """
+    frame_pages() の各フレームが content.tex の何番目のフレームか（0 は表紙）を返す。
+    マクロが追加したフレームなど、対応しないものは None。
+    """
+    owner: list[int | None] = [None] * len(pages)
+    if pages and pages[0][0] == 1:
+        owner[0] = 0
+    for i, page in marks.items():
+        for k, (first, last) in enumerate(pages):
+            if first <= page <= last:
+                owner[k] = i
+                break
+    return owner
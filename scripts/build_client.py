@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+
+# build_client.py — 常駐ビルドサーバー (build_server.py) へのクライアント
+#
+# 引数は build_slides1.py と同じ。
+#   python build_client.py 1020701 02 --page 3-5
+#
+# サーバーが起動していなければ、その場で build_slides1.py と同じビルドを実行する。
+from __future__ import annotations
+
+import json
+import os
+import socket
+import sys
+from pathlib import Path
+
+
+def default_socket_path() -> Path:
+    """サーバーとクライアントが共有する Unix ソケットのパス"""
+    env = os.environ.get("BUILD_SLIDE_SOCKET")
+    if env:
+        return Path(env)
+    return Path("/tmp") / f"build_slide-{os.getuid()}.sock"
+
+
+def run_remote(argv: list[str], sock_path: Path) -> int:
+    """
+    ビルド要求を1行の JSON で送り、サーバーから返ってくるログを表示する。
+    戻り値はサーバー側ビルドの終了コード。
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(str(sock_path))
+        req = {"argv": argv, "tty": sys.stdout.isatty()}
+        sock.sendall((json.dumps(req, ensure_ascii=False) + "\n").encode("utf-8"))
+
+        with sock.makefile("r", encoding="utf-8") as f:
+            for line in f:
+                msg = json.loads(line)
+                if "exit" in msg:
+                    return int(msg["exit"])
+                stream = sys.stderr if msg.get("stream") == "err" else sys.stdout
+                stream.write(msg.get("data", ""))
+                stream.flush()
+
+    print("❌ サーバーとの接続が途中で切れました", file=sys.stderr)
+    return 1
+
+
+def main() -> None:
+    argv = sys.argv[1:]
+    sock_path = default_socket_path()
+    try:
+        sys.exit(run_remote(argv, sock_path))
+    except (FileNotFoundError, ConnectionRefusedError):
+        print(f"⚠️ ビルドサーバーに接続できません ({sock_path})。ローカルで実行します。")
+
+    # サーバー未起動：従来どおりこのプロセスでビルドする
+    sys.path.insert(0, str(Path(__file__).parent))
+    import build_slides1
+    build_slides1.main(argv)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+
+# build_server.py — 常駐ビルドサーバー（Unix ソケット）
+#
+# 起動:
+#   python build_server.py            # 既定のソケット (build_client.default_socket_path)
+#   python build_server.py --socket /tmp/xxx.sock
+#
+# クライアント (build_client.py) から build_slides1.py と同じ引数を受け取り、
+# このプロセス内でビルドしてログをクライアントへ返す。
+# テンプレート・授業フォルダの解決結果・画像の manifest はプロセス内に保持されたままになる。
+from __future__ import annotations
+
+import argparse
+import contextvars
+import io
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from pathlib import Path
+
+import build_slides1
+from build_client import default_socket_path
+from builderrors import BuildError, print_error
+
+
+# =========================
+#  リクエストごとの出力振り分け
+# =========================
+
+# (送信関数, tty) 。ContextVar なので、ビルド中のワーカースレッド（分割ビルド・サムネイル）にも
+# contextvars.copy_context().run で渡した分は同じクライアントへ送られる
+_route: contextvars.ContextVar[tuple | None] = contextvars.ContextVar("build_server_route", default=None)
+
+
+class _RoutedStream(io.TextIOBase):
+    """
+    sys.stdout / sys.stderr の差し替え用。
+    リクエスト処理中のコンテキストからの出力はそのクライアントへ送り、
+    それ以外はサーバー本来の出力へ書く。
+    """
+
+    def __init__(self, default, name: str):
+        self._default = default
+        self._name = name
+
+    def write(self, s: str) -> int:
+        route = _route.get()
+        if route is None:
+            return self._default.write(s)
+        route[0](self._name, s)
+        return len(s)
+
+    def flush(self) -> None:
+        if _route.get() is None:
+            self._default.flush()
+
+    def isatty(self) -> bool:
+        route = _route.get()
+        if route is None:
+            return self._default.isatty()
+        return bool(route[1])
+
+
+# =========================
+#  Server
+# =========================
+
+class BuildServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, sock_path: Path):
+        self._locks: dict[tuple[str, str], threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        super().__init__(str(sock_path), BuildRequestHandler)
+
+    @contextmanager
+    def lesson_lock(self, key: tuple[str, str]):
+        """同じ講義 (科目コード, コマ番号) のビルドは直列化し、別の講義は並行に走らせる"""
+        with self._locks_guard:
+            lock = self._locks.setdefault(key, threading.Lock())
+        if not lock.acquire(blocking=False):
+            print(f"⏳ {key[0]}/{key[1]} のビルドが実行中のため待機します")
+            lock.acquire()
+        try:
+            yield
+        finally:
+            lock.release()
+
+
+class BuildRequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self) -> None:
+        line = self.rfile.readline()
+        if not line: return
+        req = json.loads(line.decode("utf-8"))
+        argv = [str(a) for a in req.get("argv", [])]
+        print(f"▶ {' '.join(argv)}", file=sys.__stdout__, flush=True)
+
+        connected = True
+        def send(stream: str, data: str) -> None:
+            nonlocal connected
+            if not connected or not data: return
+            msg = {"stream": stream, "data": data}
+            try:
+                self.wfile.write((json.dumps(msg, ensure_ascii=False) + "\n").encode("utf-8"))
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                connected = False
+
+        start = time.perf_counter()
+        token = _route.set((send, req.get("tty", False)))
+        try:
+            code = self._run_build(argv)
+        finally:
+            _route.reset(token)
+        print(f"■ {' '.join(argv)} (exit {code}, {time.perf_counter() - start:.1f}秒)", file=sys.__stdout__, flush=True)
+
+        if connected:
+            try:
+                self.wfile.write((json.dumps({"exit": code}) + "\n").encode("utf-8"))
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+    def _run_build(self, argv: list[str]) -> int:
+        try:
+            args = build_slides1.parse_args(argv)
+            with self.server.lesson_lock(tuple(args.items)):
+                build_slides1.build(args)
+            return 0
+        except SystemExit as e:
+            if e.code is None: return 0
+            if isinstance(e.code, int): return e.code
+            print(e.code, file=sys.stderr)
+            return 1
+        except Exception:
+            traceback.print_exc()
+            return 1
+
+
+def warm_caches() -> None:
+    """起動時にテンプレートと授業資料ルートを読み込んでおく"""
+    root = Path(__file__).parent.parent
+    for p in sorted((root / "templates").iterdir()):
+        if p.is_file():
+            build_slides1.read_template(p)
+    try:
+        build_slides1.get_sourcedir()
+    except BuildError as e:
+        # NAS に届かなくても起動はする（各ビルドで改めて解決する。--offline ならミラーを使う）
+        print_error(e)
+
+
+def _socket_in_use(sock_path: Path) -> bool:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        try:
+            s.connect(str(sock_path))
+            return True
+        except OSError:
+            return False
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="build_slides1.py の常駐ビルドサーバー")
+    ap.add_argument("--socket", default=None, help="Unix ソケットのパス")
+    args = ap.parse_args()
+
+    sock_path = Path(args.socket) if args.socket else default_socket_path()
+    if sock_path.exists():
+        if _socket_in_use(sock_path):
+            print(f"❌ すでにサーバーが起動しています: {sock_path}", file=sys.stderr); sys.exit(1)
+        sock_path.unlink()
+
+    warm_caches()
+    sys.stdout = _RoutedStream(sys.__stdout__, "out")
+    sys.stderr = _RoutedStream(sys.__stderr__, "err")
+
+    server = BuildServer(sock_path)
+    os.chmod(sock_path, 0o600)
+    print(f"🛰️ ビルドサーバー起動: {sock_path} (Ctrl-C で終了)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 ビルドサーバー終了")
+    finally:
+        server.server_close()
+        sock_path.unlink(missing_ok=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,9 +9,28 @@ import argparse
 import re
 import shutil
 import sys
+import threading
+import signal
 import time
 import os
+import hashlib
+import json
+import functools
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field, fields
+from datetime import date
 import slideinfo  
+from builderrors import BuildError, LatexError, LatexTimeout, MissingDependencyError, PreflightError, print_error
+import thumbnails
+import handout
+import hotspots
+import localcache
+import shardbuild
+import beamernav
+import preflight
+import engines
+import mirror
+import fonts
 
 # =========================
 #  Utility
@@ -42,41 +61,366 @@ def theme_from_first_line(first_line: str) -> str:
 def safe_tex_path(p: str | Path) -> str:
     return str(p).replace("\\", "/")
 
-def run_latexmk(build_dir: Path, main_tex: Path, timeout_s: int = 360) -> None:
-    cmd = ["latexmk", "-lualatex", "-shell-escape", "-interaction=nonstopmode", "-halt-on-error",
-           f"-outdir={safe_tex_path(build_dir)}", safe_tex_path(main_tex)]
+# latexmk / lualatex の出力から進捗とエラーを拾うためのパターン
+_PASS_RE = re.compile(r"Run number (\d+) of rule '(?:lua|pdf|xe)?latex'")
+_PAGE_RE = re.compile(r"\[(\d+)(?=[\]\s{<]|$)")
+_FATAL_RE = re.compile(r"^! |^!\s*\w+ error|Fatal error occurred|Emergency stop|^Latexmk: Errors, so I did not complete")
+_ERROR_LINE_RE = re.compile(r"^l\.\d+")
+# luaotfload がフォント名データベースやフォントのキャッシュを作っているときの出力
+_FONTDB_RE = re.compile(r"Font names database not found|generating new one|This can take several minutes"
+                        r"|luaotfload \| db : Reload initiated|not yet cached", re.IGNORECASE)
+
+def _kill_process(proc: subprocess.Popen) -> None:
+    """
+    プロセスグループごと止める。latexmk だけを止めても子の lualatex が stdout を開いたまま残り、
+    出力の読み取りが終わらないため。
+    """
+    if hasattr(os, "killpg"):
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+    elif proc.poll() is None:
+        proc.kill()
+
+def _print_progress(pass_no: int, page: int, last_total: int, frames: int) -> None:
+    if not frames or not sys.stdout.isatty(): return
+    total = f"/{last_total}" if last_total else ""
+    frame_info = f" (frames: {frames})"
+    print(f"\r  ⏳ pass {pass_no} | page {page}{total}{frame_info}   ", end="", flush=True)
+
+def _stream_tex(cmd: list[str], build_dir: Path, timeout_s: float, total_frames: int,
+                pass_base: int, last_total: int) -> tuple[int, int]:
+    """
+    コマンドを1つ実行し、出力を逐次読みながら進捗を表示する。戻り値は (このコマンドでのパス数, 最終ページ)。
+    致命的エラーのパターンを検出した時点でプロセスを止め、その前後の出力を持たせた LatexError を送出する。
+    """
     print("RUN:", " ".join(cmd))
+    try:
+        proc = subprocess.Popen(cmd, cwd=build_dir, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                text=True, encoding="utf-8", errors="replace", bufsize=1,
+                                start_new_session=hasattr(os, "killpg"))
+    except FileNotFoundError as e:
+        raise MissingDependencyError(f"{cmd[0]} が見つかりません（TeX Live の bin を PATH に入れてください）") from e
+    timed_out = threading.Event()
+    def on_timeout():
+        timed_out.set(); _kill_process(proc)
+    timer = threading.Timer(max(timeout_s, 0), on_timeout)
+    timer.daemon = True
+    timer.start()
+
+    tail: deque[str] = deque(maxlen=20)
+    error_lines: list[str] = []
+    pass_no, page = 0, 0
+    fontdb_noticed = False
+    try:
+        for raw in proc.stdout:
+            line = raw.rstrip("\n")
+            if error_lines:
+                # エラー行の後ろは TeX が出す "l.123 ..." まで拾って打ち切る
+                error_lines.append(line)
+                if _ERROR_LINE_RE.match(line) or len(error_lines) >= 12:
+                    break
+                continue
+            tail.append(line)
+
+            m = _PASS_RE.search(line)
+            if m:
+                if page: last_total = page
+                pass_no, page = int(m.group(1)), 0
+                _print_progress(pass_base + pass_no, page, last_total, total_frames)
+                continue
+            if _FATAL_RE.search(line):
+                error_lines = list(tail)[-4:]
+                continue
+            if not fontdb_noticed and _FONTDB_RE.search(line):
+                fontdb_noticed = True
+                if total_frames and sys.stdout.isatty(): print()
+                print("⏳ luaotfload がフォントのデータベース／キャッシュを作成中です（初回は数分かかります。"
+                      "python fonts.py warmup で事前に作成できます）")
+            for m in _PAGE_RE.finditer(line):
+                n = int(m.group(1))
+                if n > page:
+                    page = n
+                    _print_progress(pass_base + max(pass_no, 1), page, last_total, total_frames)
+    finally:
+        timer.cancel()
+        if error_lines or timed_out.is_set(): _kill_process(proc)
+        proc.stdout.close()
+        proc.wait()
+        if total_frames and sys.stdout.isatty(): print()
+
+    if timed_out.is_set():
+        raise LatexTimeout("タイムアウト", build_dir, list(tail))
+    if error_lines or proc.returncode != 0:
+        raise LatexError("LaTeX コンパイル失敗", build_dir, error_lines or list(tail))
+    return max(pass_no, 1), page or last_total
+
+def run_latexmk(build_dir: Path, main_tex: Path, timeout_s: int = 360, total_frames: int = 0,
+                engine: str = engines.DEFAULT) -> int:
+    """
+    main_tex をコンパイルする。実行するコマンドはエンジン (engines.py、既定は latexmk) が決める。
+    戻り値は TeX の実行回数（パス数）。失敗時は LatexError、全体で timeout_s 秒を超えたら LatexTimeout を送出する。
+    total_frames が 0 のときは進捗行を出さない（分割ビルドで並行実行する場合など）。
+    """
     start = time.perf_counter()
+    passes, last_total = 0, 0
+    commands = engines.get(engine).commands(build_dir, main_tex)
     try:
-        res = subprocess.run(cmd, cwd=build_dir, capture_output=True, text=True, timeout=timeout_s)
-    except subprocess.TimeoutExpired:
-        print("❌ タイムアウト", file=sys.stderr); sys.exit(1)
-    
-    print(f"latexコンパイル時間: {time.perf_counter() - start:.3f}秒")
-    if res.returncode != 0:
-        print("❌ LaTeX コンパイル失敗", file=sys.stderr)
-        print(f"📂 中間ファイルとログはこちらを確認してください:")
-        print(f"   open {build_dir}")
-        sys.exit(1)
+        cmd = next(commands, None)
+        while cmd is not None:
+            try:
+                n, last_total = _stream_tex(cmd, build_dir, start + timeout_s - time.perf_counter(),
+                                            total_frames, passes, last_total)
+            except LatexTimeout:
+                raise
+            except LatexError as e:
+                # 失敗はエンジンに渡す（fmt は .fmt の作成失敗なら lualatex に切り替える）。処理しなければそのまま送出される
+                try:
+                    cmd = commands.throw(e)
+                except StopIteration:
+                    cmd = None
+                continue
+            passes += n
+            cmd = next(commands, None)
+    except LatexTimeout as e:
+        raise LatexTimeout(f"タイムアウト ({timeout_s}秒)", e.build_dir, e.context) from None
+    finally:
+        print(f"latexコンパイル時間: {time.perf_counter() - start:.3f}秒 (pass: {max(passes, 1)}, engine: {engine})")
     print("🙆‍♀️ LaTeX コンパイル成功")
+    return max(passes, 1)
+
+_WARNING_RE = re.compile(r"^(?:LaTeX Warning|Package \S+ Warning|Class \S+ Warning|Overfull|Underfull)")
+
+def collect_warnings(log_paths: list[Path], limit: int = 200) -> list[str]:
+    """.log から警告行（Overfull/Underfull を含む）を重複を除いて集める"""
+    seen: dict[str, None] = {}
+    for log in log_paths:
+        if not log.exists(): continue
+        for line in log.read_text(encoding="utf-8", errors="replace").splitlines():
+            if _WARNING_RE.match(line):
+                seen.setdefault(line.strip(), None)
+                if len(seen) >= limit: return list(seen)
+    return list(seen)
 
 def find_frame_positions(tex: str) -> list[tuple[int, int]]:
     pattern = re.compile(r"(\\begin\{frame\}(?:\[[^\]]*\])?(?:\{.*?\})?.*?\\end\{frame\})", flags=re.DOTALL)
     return [(m.start(1), m.end(1)) for m in pattern.finditer(tex)]
 
+def _read_braced(s: str, i: int) -> str | None:
+    """s[i] が '{' のとき、対応する '}' までの中身を返す"""
+    if i >= len(s) or s[i] != "{": return None
+    depth = 0
+    for j in range(i, len(s)):
+        if s[j] == "{": depth += 1
+        elif s[j] == "}":
+            depth -= 1
+            if depth == 0: return s[i+1:j]
+    return None
+
+def frame_title(frame_tex: str) -> str:
+    """\\begin{frame}{...} または \\frametitle{...} からフレームタイトルを取り出す"""
+    m = re.match(r"\\begin\{frame\}(?:<[^>]*>)?(?:\[[^\]]*\])?[ \t]*", frame_tex)
+    title = _read_braced(frame_tex, m.end()) if m else None
+    if title is None:
+        m = re.search(r"\\frametitle(?:<[^>]*>)?(?:\[[^\]]*\])?\s*", frame_tex)
+        title = _read_braced(frame_tex, m.end()) if m else None
+    return " ".join((title or "").split())
+
+# =========================
+#  フレーム位置のキャッシュ（content.tex のハッシュごとのサイドカー）
+# =========================
+
+# 常駐サーバーで増え続けないよう、メモリ上には最近使ったものだけを置く
+_FRAME_INDEX: OrderedDict[str, dict] = OrderedDict()
+_FRAME_INDEX_MAX = 64
+# 常駐サーバーでは複数のリクエストのスレッドから使われる
+_FRAME_INDEX_LOCK = threading.Lock()
+
+def _remember_sidecar(sha: str, info: dict) -> None:
+    with _FRAME_INDEX_LOCK:
+        _FRAME_INDEX[sha] = info
+        _FRAME_INDEX.move_to_end(sha)
+        while len(_FRAME_INDEX) > _FRAME_INDEX_MAX:
+            _FRAME_INDEX.popitem(last=False)
+
+def _load_sidecar(sha: str) -> dict | None:
+    """サイドカーは成果物ストア (localcache.ArtifactStore の frameindex) に置き、gc の対象にする"""
+    with _FRAME_INDEX_LOCK:
+        info = _FRAME_INDEX.get(sha)
+        if info is not None:
+            _FRAME_INDEX.move_to_end(sha)
+            return info
+    data = localcache.ArtifactStore().read_bytes("frameindex", sha)
+    if data is None: return None
+    try:
+        info = json.loads(data)
+    except ValueError:
+        return None
+    _remember_sidecar(sha, info)
+    return info
+
+def _save_sidecar(sha: str, info: dict) -> None:
+    _remember_sidecar(sha, info)
+    localcache.ArtifactStore().put_bytes("frameindex", sha, json.dumps(info).encode("utf-8"))
+
+def atomic_write_text(path: Path, text: str) -> None:
+    """同じフォルダの一時ファイルに書いてから置き換える（書きかけの状態を見せない）"""
+    tmp = localcache.tmp_path(path, prefix=".")
+    tmp.write_text(text, encoding="utf-8")
+    if path.exists(): shutil.copymode(path, tmp)
+    os.replace(tmp, path)
+
+def text_sha(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def frame_index(tex: str) -> list[tuple[int, int]]:
+    """find_frame_positions の結果を内容のハッシュごとにキャッシュして返す"""
+    sha = text_sha(tex)
+    info = _load_sidecar(sha)
+    if info is None:
+        info = {"frames": find_frame_positions(tex), "banded": False}
+        _save_sidecar(sha, info)
+    return [tuple(p) for p in info["frames"]]
+
 def extract_frames(tex: str, fp: int, tp: int) -> str:
-    pos = find_frame_positions(tex)
+    pos = frame_index(tex)
     if not pos: return ""
     fp, tp = max(1, fp), min(tp, len(pos))
     return "\n\n".join([tex[pos[i-1][0]:pos[i-1][1]] for i in range(fp, tp+1)])
 
-def apply_modes_to_template(content: str, *, ho: bool, tech: bool, tdir_name: str, left_footer: str = "") -> str:
+# =========================
+#  キャッシュ（常駐サーバーから呼ばれる場合はプロセス内で使い回される）
+# =========================
+
+_TEMPLATE_CACHE: dict[Path, tuple[int, str]] = {}
+_LESSON_INDEX: dict[tuple[str, str], str] = {}
+_SOURCEDIR: dict[date, str] = {}
+_ASSET_MANIFESTS: dict[Path, dict[str, tuple[int, int]]] = {}
+
+def read_template(path: Path) -> str:
+    """テンプレートを読み込む。mtime が変わっていなければメモリ上の内容を返す。"""
+    mtime = path.stat().st_mtime_ns
+    cached = _TEMPLATE_CACHE.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    text = path.read_text(encoding="utf-8")
+    _TEMPLATE_CACHE[path] = (mtime, text)
+    return text
+
+def get_sourcedir() -> str:
+    """
+    授業資料ルート（年度で変わる）。常駐サーバーで年度をまたいでも古いルートを使わないよう、
+    解決結果は日付ごとに覚え、日付が変わったら授業フォルダの解決結果も捨てる。
+    """
+    today = date.today()
+    if today not in _SOURCEDIR:
+        _SOURCEDIR.clear()
+        _LESSON_INDEX.clear()
+        _SOURCEDIR[today] = slideinfo.getsourcedir()
+    return _SOURCEDIR[today]
+
+def lesson_dir(subj_code: str, tdir_name: str) -> str:
+    """科目コード・コマ番号から授業資料ルート相対のフォルダを返す（解決結果はその日のあいだキャッシュする）"""
+    get_sourcedir()
+    key = (subj_code, tdir_name)
+    if key not in _LESSON_INDEX:
+        tagdir = slideinfo.slidedir(subj_code, tdir_name)
+        if not tagdir: return tagdir
+        _LESSON_INDEX[key] = tagdir
+    return _LESSON_INDEX[key]
+
+def sync_images(src: Path, dst: Path) -> int:
+    """
+    src の画像を dst へ同期する。前回コピー時の (size, mtime) を manifest として覚えておき、
+    変化したファイルだけをコピーする。戻り値はコピーしたファイル数。
+    """
+    if dst not in _ASSET_MANIFESTS and dst.exists():
+        # このプロセスで初めての同期では、前回の内容が分からないので作り直す（消えた画像を残さない）
+        shutil.rmtree(dst)
+    manifest = _ASSET_MANIFESTS.setdefault(dst, {})
+    if not dst.exists(): manifest.clear()
+    seen: set[str] = set()
+    copied = 0
+    for dirpath, _dirnames, filenames in os.walk(src):
+        for name in filenames:
+            sp = Path(dirpath) / name
+            rel = sp.relative_to(src).as_posix()
+            st = sp.stat()
+            key = (st.st_size, st.st_mtime_ns)
+            seen.add(rel)
+            dp = dst / rel
+            if manifest.get(rel) == key and dp.exists(): continue
+            dp.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(sp, dp)
+            manifest[rel] = key
+            copied += 1
+    for rel in set(manifest) - seen:
+        (dst / rel).unlink(missing_ok=True)
+        del manifest[rel]
+    return copied
+
+def local_build_dir(subj_code: str, tdir_name: str) -> Path:
+    """ローカル (/tmp) の中間ファイル置き場。科目名や回数を含めて衝突を避ける"""
+    return Path("/tmp") / "latex_build" / subj_code / tdir_name
+
+def clean_build_dir(build_dir: Path, keep: tuple[str, ...] = ("images",)) -> None:
+    """中間ファイルを削除する。画像フォルダは差分同期するので残す。"""
+    if not build_dir.exists(): return
+    for p in build_dir.iterdir():
+        if p.name in keep: continue
+        if p.is_dir() and not p.is_symlink(): shutil.rmtree(p)
+        else: p.unlink()
+
+# minted のハイライト結果（_minted-main/ など）は毎回消えるので、成果物ストアに内容のハッシュで保存し、
+# 授業回ごとに「どのファイルがあったか」を manifest にしておいて次のビルドの前に戻す
+_MINTED_DIRS = ("_minted-main", "_minted")
+
+def _minted_manifest_key(subj_code: str, tdir_name: str) -> str:
+    return "minted-" + text_sha(f"{subj_code}/{tdir_name}")[:20]
+
+def restore_minted(build_dir: Path, subj_code: str, tdir_name: str) -> int:
+    store = localcache.ArtifactStore()
+    data = store.read_bytes("manifests", _minted_manifest_key(subj_code, tdir_name))
+    if not data: return 0
+    restored = 0
+    for rel, sha in json.loads(data).items():
+        dst = build_dir / rel
+        if dst.exists(): continue
+        dst.parent.mkdir(exist_ok=True)
+        restored += store.fetch("minted", sha, dst)
+    return restored
+
+def save_minted(build_dir: Path, subj_code: str, tdir_name: str) -> None:
+    files = [p for d in _MINTED_DIRS if (build_dir / d).is_dir() for p in (build_dir / d).iterdir() if p.is_file()]
+    if not files: return
+    store = localcache.ArtifactStore()
+    manifest = {}
+    for p in files:
+        sha = hashlib.sha256(p.read_bytes()).hexdigest()
+        if store.get("minted", sha) is None:
+            store.put_file("minted", sha, p)
+        manifest[p.relative_to(build_dir).as_posix()] = sha
+    store.put_bytes("manifests", _minted_manifest_key(subj_code, tdir_name),
+                    json.dumps(manifest, sort_keys=True).encode("utf-8"))
+
+# scripts フォルダの1つ上がツールのルート
+TOOL_ROOT = Path(__file__).absolute().parent.parent
+TEMPLATE_DIR = TOOL_ROOT / "templates"
+TOOL_IMG_DIR = TOOL_ROOT / "project_assets" / "images"
+EMOJI_IMG_DIR = TOOL_ROOT / "project_assets" / "emoji" / "emoji_pngs"
+
+def graphics_dirs(app_dir: Path) -> list[Path]:
+    """macros.tex の \\graphicspath と同じ順の画像の探索先（images/... の名前は preflight.find_image が扱う）"""
+    return [app_dir / "images", TOOL_IMG_DIR, EMOJI_IMG_DIR]
+
+def apply_modes_to_template(content: str, *, ho: bool, tech: bool, tdir_name: str, left_footer: str = "",
+                            sourcedir: str | None = None) -> str:
     # --- パス計算（絶対パス） ---
-    # scripts フォルダの1つ上がツールのルート
-    root = Path(__file__).parent.parent
-    tool_img_dir = (root / "project_assets" / "images").absolute()
-    emoji_img_dir = (root / "project_assets" / "emoji" / "emoji_pngs").absolute()
-    sourcedir_text = slideinfo.getsourcedir()
+    # sourcedir はミラー使用時のローカルの授業資料ルート（既定は NAS 側）
+    tool_img_dir = TOOL_IMG_DIR
+    emoji_img_dir = EMOJI_IMG_DIR
+    sourcedir_text = sourcedir or get_sourcedir()
 
     # --- 1. 定数・パス系の置換 ---
     content = content.replace("@@sdir@@", safe_tex_path(tdir_name))
@@ -84,6 +428,7 @@ def apply_modes_to_template(content: str, *, ho: bool, tech: bool, tdir_name: st
     content = content.replace("@@tool_img@@", str(tool_img_dir))
     content = content.replace("@@emoji_img@@", str(emoji_img_dir))
     content = content.replace("@@leftfooter@@", left_footer)
+    content = fonts.apply_placeholders(content)
 
     # --- 2. モード（スイッチ）系の置換 ---
     content = content.replace("%@@pausemode@@", r"\mypausemodefalse" if ho else r"\mypausemodetrue")
@@ -98,7 +443,14 @@ def apply_modes_to_template(content: str, *, ho: bool, tech: bool, tdir_name: st
     return content
 
 def sync_page_comments_to_source(content_path: Path):
+    """
+    content.tex の %@@PAGEBAND@@ コメント（page 番号の帯）を付け直す。--pageband 指定時のみ実行する。
+    付け直し済みの内容はハッシュで覚えておき、変化がなければ読むだけで何もしない。
+    書き込みは一時ファイル経由で置き換える。
+    """
     text = content_path.read_text(encoding="utf-8")
+    info = _load_sidecar(text_sha(text))
+    if info and info.get("banded"): return
     text2 = re.sub(rf'(?m)^\s*%@@PAGEBAND@@\s*\n(?:^\s*%[^\n]*\n)+', '', text)
     count = 0
     def repl(match):
@@ -106,14 +458,15 @@ def sync_page_comments_to_source(content_path: Path):
         return f"\n%@@PAGEBAND@@\n% {'-'*88}\n%   page {count:02d}\n% {'-'*88}\n{match.group(0)}"
     new_text = re.sub(r'(?m)^\\begin\{frame\}', repl, text2)
     if text != new_text:
-        content_path.write_text(new_text, encoding="utf-8")
+        atomic_write_text(content_path, new_text)
         print(f"✅ ページ番号刷新 (Total: {count} frames)")
+    _save_sidecar(text_sha(new_text), {"frames": find_frame_positions(new_text), "banded": True})
 
 # =========================
 #  引数表示
 # =========================
 def display_build_config(subj_code: str, tdir_name: str, tagdir: str, stitle: str, 
-                         args: argparse.Namespace, ctheme: str, content_path: Path, build_dir: Path):
+                         args: BuildRequest, ctheme: str, content_path: Path, build_dir: Path):
     """実行前に現在のビルド設定を一覧表示する"""
     
     # タイトルの取得元を判定
@@ -144,41 +497,92 @@ def display_build_config(subj_code: str, tdir_name: str, tagdir: str, stitle: st
     print(f"  ■ 左フッター    : {'[非表示]' if args.hidefooter else '[表示]'}")
     print(f"  ■ ソースファイル: {content_path}")
     print(f"  ■ 中間ファイル  : {build_dir}")
+    print(f"  ■ エンジン      : {args.engine}")
     print("=" * 65 + "\n")
 
 # =========================
-#  Main
+#  Build API
 # =========================
 
-def main() -> None:
-    ap = argparse.ArgumentParser(description="Beamer スライド部分抽出 & ビルド")
-    ap.add_argument("items", nargs=2, help="科目コード ディレクトリ名")
-    ap.add_argument("--page", "-p", default="")
-    ap.add_argument("--ho", action="store_true")
-    ap.add_argument("--tech", action="store_true")
-    ap.add_argument("--hidefooter", action="store_true")
-    ap.add_argument("--title", default=None)
-    ap.add_argument("--save", action="store_true", help="講義フォルダ内のbuildディレクトリに中間ファイル保存する")
-    args = ap.parse_args()
-
-    subj_code, tdir_name = args.items
-    tagdir = slideinfo.slidedir(subj_code, tdir_name)
-    if not tagdir: sys.exit(1)
+@dataclass
+class BuildRequest:
+    """
+    1回のビルドの指定。項目はコマンドライン引数と同じ（subject / lesson は items の2つ）。
+    """
+    subject: str
+    lesson: str
+    page: str = ""
+    ho: bool = False
+    tech: bool = False
+    hidefooter: bool = False
+    title: str | None = None
+    save: bool = False
+    with_ho: bool = False
+    nup: int = 1
+    profile: bool = False
+    pageband: bool = False
+    shards: int = 1
+    thumbs: bool = False
+    preflight: bool = True
+    mirror: bool = False
+    offline: bool = False
+    engine: str = engines.DEFAULT
+
+    @classmethod
+    def from_args(cls, args: argparse.Namespace) -> BuildRequest:
+        subject, lesson = args.items
+        opts = {f.name: getattr(args, f.name) for f in fields(cls) if f.name not in ("subject", "lesson")}
+        return cls(subject=subject, lesson=lesson, **opts)
+
+@dataclass
+class BuildResult:
+    """ビルド結果。timings は工程ごとの秒数"""
+    request: BuildRequest
+    output: Path
+    build_dir: Path
+    handout: Path | None = None
+    passes: int = 0
+    pages: int = 0
+    timings: dict[str, float] = field(default_factory=dict)
+    warnings: list[str] = field(default_factory=list)
+
+def build_lesson(args: BuildRequest) -> BuildResult:
+    """
+    1つの授業回をビルドする。失敗したときは BuildError（LatexError など）を送出する。
+    進捗はこれまでどおり標準出力に表示する。
+    """
+    t_start = time.perf_counter()
+    timings: dict[str, float] = {}
+    subj_code, tdir_name = args.subject, args.lesson
+    mirrored = args.mirror or args.offline
+    if mirrored:
+        # ローカルのミラーからビルドし、結果は mirror.py publish で NAS に戻す
+        if args.pageband: raise BuildError("--pageband はミラーからのビルドでは使えません（NAS の content.tex を直接更新します）")
+        mirror_dir, tagdir, yaml_title = mirror.prepare(subj_code, tdir_name, offline=args.offline)
+        sourcedir_text = str(mirror_dir)
+    else:
+        tagdir = lesson_dir(subj_code, tdir_name)
+        if not tagdir: raise BuildError(f"授業フォルダが解決できません: {subj_code}/{tdir_name}")
+        sourcedir_text = get_sourcedir()
+        yaml_title = None
 
     root = Path(__file__).parent.parent
-    sourcedir_text = slideinfo.getsourcedir()
     app_dir = Path(sourcedir_text) / tagdir
     content_path = app_dir / "content.tex"
-    if not content_path.exists(): sys.exit(1)
+    if not content_path.exists(): raise BuildError(f"content.tex がありません: {content_path}")
 
     # 1. 前準備
-    sync_page_comments_to_source(content_path)
-    fp, tp = parse_page_range(args.page)
+    if args.pageband:
+        sync_page_comments_to_source(content_path)
+    try:
+        fp, tp = parse_page_range(args.page)
+    except argparse.ArgumentTypeError as e:
+        raise BuildError(f"{e}: {args.page}") from e
 
     # Title handling (B仕様):
     #  - --title 指定時：その文字列のみ表示（番号なし）
     #  - 未指定時：<tdir>_<YAML title> を表示
-    yaml_title = slideinfo.slidetitle(subj_code, tdir_name)
+    yaml_title = yaml_title or slideinfo.slidetitle(subj_code, tdir_name)
     raw_title = args.title if args.title else yaml_title
 
     def tex_escape(s: str) -> str:
@@ -203,9 +607,8 @@ def main() -> None:
         # print(f"📁 QNAP Build Mode: {build_dir}")
     else:
     # MacのローカルSSD (/tmp) を使用。科目名や回数を含めて衝突を避ける
-        build_dir = Path("/tmp") / "latex_build" / subj_code / tdir_name
-        if build_dir.exists():
-            shutil.rmtree(build_dir)
+        build_dir = local_build_dir(subj_code, tdir_name)
+        clean_build_dir(build_dir)
 
         # print(f"🛩️ Local Build Mode: {build_dir}")
         
@@ -216,8 +619,8 @@ def main() -> None:
     dst_images = build_dir / "images"
 
     if src_images.exists() and src_images.is_dir():
-        shutil.copytree(src_images, dst_images, dirs_exist_ok=True)
-        print(f"✅ images copied: {src_images} -> {dst_images}")
+        copied = sync_images(src_images, dst_images)
+        print(f"✅ images synced ({copied} copied): {src_images} -> {dst_images}")
     else:
         print(f"⚠️ images folder not found: {src_images}")
 
@@ -227,29 +630,47 @@ def main() -> None:
 
     # 引数の表示
     display_build_config(subj_code, tdir_name, tagdir, stitle, args, ctheme, content_path, build_dir)
+
+    # 事前チェック（問題があれば LaTeX を起動しない）
+    if args.preflight:
+        t_check = time.perf_counter()
+        issues = preflight.check_lesson(content_path)
+        if issues:
+            raise PreflightError(f"事前チェックで {len(issues)} 件の問題が見つかりました（--no-preflight で省略）",
+                                 [f"{content_path.name}:{i}" for i in issues])
+        print(f"✅ 事前チェック OK ({(time.perf_counter() - t_check) * 1000:.1f}ms)")
+        # テンプレートのフォントがこのマシンで見つかるか（結果はローカルにキャッシュ）
+        missing = fonts.check_fonts(TEMPLATE_DIR)
+        if missing:
+            raise PreflightError("テンプレートのフォントがこのマシンで見つかりません（python fonts.py warmup で確認・作成）",
+                                 missing)
     
     templ_map = {"SimpleDarkBlue": "main_template_org1.tex", "metropolis": "main_template_org1.tex"}
     templ_file = root / "templates" / templ_map[ctheme]
-    if not templ_file.exists(): sys.exit(1)
+    if not templ_file.exists(): raise BuildError(f"テンプレートがありません: {templ_file}")
 
     # 親テンプレートの処理
-    templ_raw = templ_file.read_text(encoding="utf-8")
-    tex_main = apply_modes_to_template(templ_raw, ho=args.ho, tech=args.tech, tdir_name=tdir_name, left_footer=l_footer_content)
+    templ_raw = read_template(templ_file)
+    tex_main = apply_modes_to_template(templ_raw, ho=args.ho, tech=args.tech, tdir_name=tdir_name,
+                                       left_footer=l_footer_content, sourcedir=sourcedir_text)
     tex_main = tex_main.replace("@@stitle@@", display_title_tex)
+    rendered_subs: dict[str, str] = {}
     # サブファイルの処理
     sub_files = ["preamble.tex", "macros.tex", "styles.tex", "emoji_macros.tex", "grid_debug.tex","teacherframe.sty"]
     for sub_name in sub_files:
         sub_path = root / "templates" / sub_name
         if not sub_path.exists(): continue
-        sub_c = sub_path.read_text(encoding="utf-8")
+        sub_c = read_template(sub_path)
         
         if args.tech:
             sub_c = sub_c.replace("%@@setbeamcolor@@", r"\setbeamercolor{background canvas}{bg=white}")
         else:
             sub_c = sub_c.replace("%@@setbeamcolor@@", "")
         
-        sub_c = apply_modes_to_template(sub_c, ho=args.ho, tech=args.tech, tdir_name=tdir_name, left_footer=l_footer_content)
+        sub_c = apply_modes_to_template(sub_c, ho=args.ho, tech=args.tech, tdir_name=tdir_name,
+                                        left_footer=l_footer_content, sourcedir=sourcedir_text)
         (build_dir / sub_name).write_text(sub_c, encoding="utf-8")
+        rendered_subs[sub_name] = sub_c
 
     print("✅ プリアンブル作成（サブファイルの配備完了）")
 
@@ -260,27 +681,139 @@ def main() -> None:
     else:
         body = text2.rstrip()
         suffix_tag = None
+    pos = frame_index(text2)
+    selected = pos[fp-1:tp] if fp != -1 else pos
 
     # 4. main.tex 組み立て
-    final_tex = tex_main.replace("@@BODY@@", body)
+    if args.thumbs:
+        # サムネイルで .nav のフレームと content.tex のフレームを対応させる印
+        body = beamernav.mark_frames(body, find_frame_positions(body))
+    if args.profile:
+        # 各フレームの前後に LuaTeX の計測マーカーを入れる
+        hotspots.write_lua(build_dir)
+        final_tex = tex_main.replace("@@BODY@@", hotspots.instrument_body(body, find_frame_positions(body)))
+    else:
+        final_tex = tex_main.replace("@@BODY@@", body)
     main_tex = build_dir / "main.tex"
     main_tex.write_text(final_tex, encoding="utf-8")
 
+    timings["prepare"] = time.perf_counter() - t_start
+
     # 5. 実行とコピー
-    run_latexmk(build_dir, main_tex)
+    t_compile = time.perf_counter()
+    for old in [build_dir / fonts.TSV_FILE, *build_dir.glob(f"shard*/{fonts.TSV_FILE}"),
+                build_dir / beamernav.MARKS_FILE, *build_dir.glob(f"shard*/{beamernav.MARKS_FILE}")]:
+        old.unlink(missing_ok=True)  # --save のときは前回の計測が残っている
+    shards = args.shards if args.shards > 0 else (os.cpu_count() or 1)
+    if shards > 1 and args.profile:
+        print("⚠️ --profile 指定時は分割ビルドを行いません")
+        shards = 1
+    if shards > 1 and len(selected) > 1:
+        passes = shardbuild.compile_sharded(build_dir, tex_main, body, find_frame_positions(body), shards,
+                                            rendered_subs, functools.partial(run_latexmk, engine=args.engine),
+                                            ho=args.ho, tech=args.tech)
+        logs = sorted(build_dir.glob("shard*/main.log"))
+    else:
+        restored = restore_minted(build_dir, subj_code, tdir_name)
+        if restored: print(f"✅ minted のキャッシュを {restored} 件復元")
+        passes = run_latexmk(build_dir, main_tex, total_frames=len(selected) + 1, engine=args.engine)
+        save_minted(build_dir, subj_code, tdir_name)
+        logs = [build_dir / "main.log"]
+    timings["compile"] = time.perf_counter() - t_compile
+    t_post = time.perf_counter()
+    fonts.report(build_dir if (build_dir / fonts.TSV_FILE).exists() else build_dir / "shard00")
+
+    if args.profile:
+        first = fp if fp != -1 else 1
+        hotspots.report(build_dir, [{"page": first + n, "line": text2.count("\n", 0, a) + 1,
+                                     "title": frame_title(text2[a:b])} for n, (a, b) in enumerate(selected)])
 
     # PDFのファイル名を作成
     stem = f"{tdir_name}_{stitle}{suffix_tag if suffix_tag else ('_tech' if args.tech else ('_pr' if not args.ho else ''))}"
     final_pdf = app_dir / f"{stem}.pdf" # 保存先は講義フォルダ直下
     
     # build/main.pdf を app_dir/XXX.pdf へ移動（またはコピー）
-    if (build_dir / "main.pdf").exists():
-        shutil.copy2(build_dir / "main.pdf", final_pdf)
-        print("📝 出力:", final_pdf)
+    if not (build_dir / "main.pdf").exists():
+        raise LatexError("PDFが生成されませんでした。build/main.log を確認してください。", build_dir)
+    shutil.copy2(build_dir / "main.pdf", final_pdf)
+    print("📝 出力:", final_pdf)
+
+    # ハンズアウトはプレゼン用PDFの各フレーム最終ページから作る
+    ho_pdf = None
+    if args.with_ho:
+        if args.ho or args.tech or suffix_tag:
+            print("⚠️ --with-ho はプレゼン用の全文ビルドでのみ有効です")
+        else:
+            ho_pdf = app_dir / f"{tdir_name}_{stitle}.pdf"
+            n = handout.derive_handout(final_pdf, build_dir / "main.nav", ho_pdf, nup=args.nup)
+            print(f"📝 出力: {ho_pdf} (handout {n} frames)")
+
+    # 6. サムネイル（フレーム内容が変わったページだけ作り直す）
+    thumbs_dir = None
+    if args.thumbs:
+        thumbs_dir = app_dir / "thumbs" / stem
+        context = thumbnails.frame_key(tex_main, *rendered_subs.values(), str(len(selected)))
+        frames = [{"key": thumbnails.frame_key(context, "title"), "title": display_title, "line": 0}]
+        # 画像を差し替えたときも作り直すよう、フレームが使う画像のサイズと更新時刻もキーに含める
+        img_dirs = graphics_dirs(app_dir)
+        emj_table = preflight.emoji_table(TEMPLATE_DIR / "emoji_macros.tex")
+        for n, (a, b) in enumerate(selected, 1):
+            images = preflight.frame_images(text2[a:b], img_dirs, [EMOJI_IMG_DIR], emj_table, app_dir)
+            stamps = [f"{p}:{p.stat().st_size}:{p.stat().st_mtime_ns}" for p in images]
+            frames.append({"key": thumbnails.frame_key(context, str(n), text2[a:b], *stamps),
+                           "title": frame_title(text2[a:b]), "line": text2.count("\n", 0, a) + 1})
+        thumbnails.export_thumbnails(final_pdf, build_dir / "main.nav", thumbs_dir, frames)
+
+    if mirrored:
+        mirror.record_pending(subj_code, tdir_name, tagdir, [p for p in (final_pdf, ho_pdf, thumbs_dir) if p])
     else:
-        print("❌ PDFが生成されませんでした。build/main.log を確認してください。")
+        slideinfo.slideinfoupdate(subj_code, tdir_name)
+    timings["post"] = time.perf_counter() - t_post
+    timings["total"] = time.perf_counter() - t_start
+
+    nav = build_dir / "main.nav"
+    return BuildResult(request=args, output=final_pdf, build_dir=build_dir, handout=ho_pdf, passes=passes,
+                       pages=beamernav.document_pages(nav) if nav.exists() else 0,
+                       timings=timings, warnings=collect_warnings(logs))
+
+# =========================
+#  Main
+# =========================
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    ap = argparse.ArgumentParser(prog="build_slides1.py", description="Beamer スライド部分抽出 & ビルド")
+    ap.add_argument("items", nargs=2, help="科目コード ディレクトリ名")
+    ap.add_argument("--page", "-p", default="")
+    ap.add_argument("--ho", action="store_true")
+    ap.add_argument("--tech", action="store_true")
+    ap.add_argument("--hidefooter", action="store_true")
+    ap.add_argument("--title", default=None)
+    ap.add_argument("--save", action="store_true", help="講義フォルダ内のbuildディレクトリに中間ファイル保存する")
+    ap.add_argument("--with-ho", action="store_true", help="プレゼン用ビルドの結果からハンズアウトPDFも作る（再コンパイルしない）")
+    ap.add_argument("--nup", type=int, default=1, choices=[1, 2, 4], help="--with-ho のとき1枚に並べるフレーム数")
+    ap.add_argument("--profile", action="store_true", help="フレームごとのコンパイル時間とオーバーレイ枚数を計測して表示する")
+    ap.add_argument("--pageband", action="store_true", help="content.tex の page 番号コメント (%%@@PAGEBAND@@) を付け直す")
+    ap.add_argument("--shards", type=int, default=1, help="フレームを N 分割して並列にコンパイルする（0 でCPU数）")
+    ap.add_argument("--thumbs", action="store_true", help="出力PDFのページサムネイルを講義フォルダの thumbs/ に作成する")
+    ap.add_argument("--engine", default=engines.DEFAULT, choices=sorted(engines.ENGINES),
+                    help=f"コンパイル方法（既定: {engines.DEFAULT}）。比較は enginebench.py で")
+    ap.add_argument("--mirror", action="store_true", help="ローカルのミラーからビルドする（結果は mirror.py publish で NAS へ）")
+    ap.add_argument("--offline", action="store_true", help="NAS にアクセスせず、前回同期したミラーでビルドする")
+    ap.add_argument("--no-preflight", dest="preflight", action="store_false", help="LaTeX 実行前の事前チェックを省略する")
+    return ap.parse_args(argv)
+
+def build(args: argparse.Namespace) -> None:
+    """コマンドライン用: エラーを表示して終了コード 1 で終わる"""
+    try:
+        result = build_lesson(BuildRequest.from_args(args))
+    except BuildError as e:
+        print_error(e)
+        sys.exit(1)
+    if result.warnings:
+        print(f"⚠️ LaTeX の警告: {len(result.warnings)} 件 (main.log)")
 
-    slideinfo.slideinfoupdate(subj_code, tdir_name)
+def main(argv: list[str] | None = None) -> None:
+    build(parse_args(argv))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,61 @@
+# builderrors.py — ビルド処理で使う例外
+#
+# ライブラリとして呼び出されたときはこれらの例外を送出し、sys.exit はしない。
+# コマンドライン（build_slides1.py など）では print_error() で表示して終了コード 1 で終わる。
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+
+class BuildError(Exception):
+    """ビルドを続けられないエラーの基底クラス"""
+
+
+class SlideInfoError(BuildError):
+    """台帳 (slideinfo.yaml) や授業資料ルートの解決に失敗した"""
+
+
+class MissingDependencyError(BuildError):
+    """任意の依存パッケージ（PyMuPDF など）が入っていない"""
+
+
+class PreflightError(BuildError):
+    """事前チェック (preflight.py) で問題が見つかった。issues は "l.行: 内容" の一覧"""
+
+    def __init__(self, message: str, issues: list[str]):
+        super().__init__(message)
+        self.issues = issues
+
+
+class LatexError(BuildError):
+    """LaTeX のコンパイルに失敗した。context にはエラー箇所付近の出力行が入る"""
+
+    def __init__(self, message: str, build_dir: Path | None = None, context: list[str] | None = None):
+        super().__init__(message)
+        self.build_dir = build_dir
+        self.context = context or []
+
+
+class LatexTimeout(LatexError):
+    """LaTeX のコンパイルが制限時間内に終わらなかった"""
+
+
+def print_error(e: BuildError) -> None:
+    """コマンドライン用のエラー表示"""
+    if isinstance(e, SlideInfoError):
+        print(f"❌ エラー: {e}", file=sys.stderr)
+    else:
+        print(f"❌ {e}", file=sys.stderr)
+    if isinstance(e, PreflightError):
+        for issue in e.issues:
+            print(f"  {issue}", file=sys.stderr)
+    if isinstance(e, LatexError):
+        if e.context:
+            print("-" * 65, file=sys.stderr)
+            for line in e.context:
+                print(f"  {line}", file=sys.stderr)
+            print("-" * 65, file=sys.stderr)
+        if e.build_dir:
+            print(f"📂 中間ファイルとログはこちらを確認してください:")
+            print(f"   open {e.build_dir}")
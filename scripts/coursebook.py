@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+
+# coursebook.py — 科目の全授業PDFを1冊にまとめる（LaTeX は実行しない）
+#
+#   python coursebook.py 1020701          # <tdir>_<title>_pr.pdf を台帳順に結合
+#   python coursebook.py 1020701 --ho     # ハンズアウト <tdir>_<title>.pdf を結合
+#
+# ・先頭に目次ページを生成し、各授業にしおりとリンクを付ける
+# ・構成PDFのハッシュを記録しておき、どれも変わっていなければ作り直さない
+# ・1授業ずつ追記保存するので、科目が大きくてもメモリ使用量は増えない
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import shutil
+import sys
+import time
+from pathlib import Path
+
+import localcache
+from builderrors import BuildError, print_error
+
+try:
+    import pymupdf
+except ImportError:
+    pymupdf = None
+
+_TOC_FONT = "japan"
+_TOC_MARGIN = 36
+_TOC_LINE = 18
+
+
+def _sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def collect_members(subj_code: str, ho: bool, previous: dict[str, dict]) -> list[dict]:
+    """
+    台帳順に構成PDFを集める。サイズと更新時刻が前回と同じならハッシュは再計算しない。
+    previous は前回の manifest の {path: member}。
+    """
+    import build_slides1
+
+    sourcedir = Path(build_slides1.get_sourcedir())
+    members = []
+    for course, title in build_slides1.slideinfo.slidelist(subj_code):
+        tagdir = build_slides1.lesson_dir(subj_code, course)
+        if not tagdir: continue
+        pdf = sourcedir / tagdir / f"{course}_{title}{'' if ho else '_pr'}.pdf"
+        if not pdf.exists():
+            print(f"⚠️ PDFがありません（スキップ）: {pdf}")
+            continue
+        st = pdf.stat()
+        old = previous.get(str(pdf))
+        if old and old["size"] == st.st_size and old["mtime_ns"] == st.st_mtime_ns:
+            sha, pages = old["sha"], old["pages"]
+        else:
+            sha = _sha256(pdf)
+            with pymupdf.open(pdf) as d:
+                pages = d.page_count
+        members.append({"course": course, "title": title, "path": str(pdf),
+                        "size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha": sha, "pages": pages})
+    return members
+
+
+def _toc_layout(page_rect, n_items: int) -> tuple[int, int]:
+    """目次1ページあたりの行数と目次のページ数"""
+    per_page = max(1, int((page_rect.height - _TOC_MARGIN * 2) // _TOC_LINE) - 2)
+    return per_page, max(1, math.ceil(n_items / per_page))
+
+
+def merge(members: list[dict], out_pdf: Path, book_title: str) -> None:
+    """目次ページ + 構成PDFを out_pdf に書く。作業ファイルはローカルに作ってから置き換える。"""
+    with pymupdf.open(members[0]["path"]) as first:
+        page_rect = first[0].rect
+    per_page, toc_pages = _toc_layout(page_rect, len(members))
+
+    # 各授業の開始ページ（0始まり）
+    starts, p = [], toc_pages
+    for m in members:
+        starts.append(p); p += m["pages"]
+
+    work = localcache.cache_root() / "coursebook" / (out_pdf.name + ".work")
+    work.parent.mkdir(parents=True, exist_ok=True)
+
+    # 1. 目次ページだけの PDF を作る
+    doc = pymupdf.open()
+    for t in range(toc_pages):
+        page = doc.new_page(width=page_rect.width, height=page_rect.height)
+        y = _TOC_MARGIN + _TOC_LINE
+        if t == 0:
+            page.insert_text((_TOC_MARGIN, y), book_title, fontname=_TOC_FONT, fontsize=16)
+        y += _TOC_LINE * 2
+        for i in range(t * per_page, min(len(members), (t + 1) * per_page)):
+            m = members[i]
+            page.insert_text((_TOC_MARGIN, y), f"{m['course']}  {m['title']}", fontname=_TOC_FONT, fontsize=11)
+            page.insert_text((page_rect.width - _TOC_MARGIN - 40, y), f"{starts[i] + 1:>5}", fontname=_TOC_FONT, fontsize=11)
+            y += _TOC_LINE
+    doc.save(work)
+    doc.close()
+
+    # 2. 1授業ずつ追記保存（読み込んだページはその都度手放す）
+    for m in members:
+        doc = pymupdf.open(work)
+        with pymupdf.open(m["path"]) as src:
+            doc.insert_pdf(src)
+        doc.saveIncr()
+        doc.close()
+
+    # 3. 目次のリンクとしおり
+    doc = pymupdf.open(work)
+    for t in range(toc_pages):
+        page = doc[t]
+        y = _TOC_MARGIN + _TOC_LINE * 3
+        for i in range(t * per_page, min(len(members), (t + 1) * per_page)):
+            rect = pymupdf.Rect(_TOC_MARGIN, y - _TOC_LINE + 4, page_rect.width - _TOC_MARGIN, y + 4)
+            page.insert_link({"kind": pymupdf.LINK_GOTO, "page": starts[i], "from": rect})
+            y += _TOC_LINE
+    doc.set_toc([[1, "目次", 1]] + [[1, f"{m['course']} {m['title']}", s + 1] for m, s in zip(members, starts)])
+    doc.saveIncr()
+    doc.close()
+
+    # NAS 側へは一時名でコピーしてから置き換える
+    tmp = localcache.tmp_path(out_pdf)
+    shutil.copyfile(work, tmp)
+    os.replace(tmp, out_pdf)
+    work.unlink()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="科目の授業PDFを台帳順に1冊にまとめる")
+    ap.add_argument("subject", help="科目コード")
+    ap.add_argument("--ho", action="store_true", help="ハンズアウトPDFをまとめる")
+    ap.add_argument("--force", action="store_true", help="変更がなくても作り直す")
+    args = ap.parse_args()
+
+    if pymupdf is None:
+        print("❌ 結合には PyMuPDF が必要です: pip install pymupdf", file=sys.stderr); sys.exit(1)
+
+    import build_slides1
+
+    start = time.perf_counter()
+    kind = "ho" if args.ho else "pr"
+    manifest_path = localcache.cache_root() / "coursebook" / f"{args.subject}_{kind}.json"
+    previous = json.loads(manifest_path.read_text(encoding="utf-8")) if manifest_path.exists() else {}
+    prev_members = {m["path"]: m for m in previous.get("members", [])}
+
+    try:
+        members = collect_members(args.subject, args.ho, prev_members)
+        if not members:
+            print("❌ まとめるPDFがありません", file=sys.stderr); sys.exit(1)
+
+        tagdir = build_slides1.lesson_dir(args.subject, members[0]["course"])
+        subject_dir = (Path(build_slides1.get_sourcedir()) / tagdir).parent
+        out_pdf = subject_dir / f"{args.subject}_coursebook_{kind}.pdf"
+
+        key = [(m["course"], m["title"], m["sha"]) for m in members]
+        old_key = [(m["course"], m["title"], m["sha"]) for m in previous.get("members", [])]
+        if not args.force and out_pdf.exists() and key == old_key and previous.get("output") == str(out_pdf):
+            print(f"✅ 変更なし: {out_pdf}")
+            return
+
+        merge(members, out_pdf, subject_dir.name)
+
+        manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = localcache.tmp_path(manifest_path)
+        tmp.write_text(json.dumps({"output": str(out_pdf), "members": members}, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp, manifest_path)
+
+        pages = sum(m["pages"] for m in members)
+        print(f"📝 出力: {out_pdf} ({len(members)} 授業 / {pages} pages, {time.perf_counter() - start:.2f}秒)")
+    except BuildError as e:
+        print_error(e); sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+
+# enginebench.py — 同じ授業回を各エンジンで繰り返しコンパイルして比較する
+#
+#   python enginebench.py 1020701 02                      # 全エンジン × 5回
+#   python enginebench.py 1020701 02 --runs 10 --engines latexmk,fmt
+#
+# 直前のビルドの中間フォルダ（main.tex と配備済みサブファイル）を入力に使うので、先に
+# build_slides1.py で一度ビルドしておくこと。毎回まっさらな作業フォルダにコピーして実行する
+# （.aux などが残っていない状態）。fmt の .fmt キャッシュは回をまたいで使う。
+# 最初の --warmup 回は集計に含めない。NAS の PDF と台帳には触れない。
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import math
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import engines
+from builderrors import BuildError, print_error
+
+_INPUT_SUFFIXES = (".tex", ".sty", ".lua")
+
+
+def stage(src: Path, dst: Path) -> Path:
+    """src の入力ファイルだけを dst にコピーし、images はリンクする"""
+    dst.mkdir(parents=True)
+    for p in src.iterdir():
+        if p.is_file() and p.suffix in _INPUT_SUFFIXES:
+            shutil.copy2(p, dst / p.name)
+    if (src / "images").is_dir():
+        (dst / "images").symlink_to((src / "images").absolute(), target_is_directory=True)
+    return dst / "main.tex"
+
+
+def p95(values: list[float]) -> float:
+    s = sorted(values)
+    return s[max(0, math.ceil(len(s) * 0.95) - 1)]
+
+
+def bench(src: Path, engine: str, runs: int, warmup: int) -> dict:
+    import build_slides1
+
+    times, passes, sizes, errors = [], [], [], []
+    with tempfile.TemporaryDirectory(prefix="enginebench-") as tmp:
+        for i in range(warmup + runs):
+            main_tex = stage(src, Path(tmp) / f"{engine}-{i:02d}")
+            start = time.perf_counter()
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    n = build_slides1.run_latexmk(main_tex.parent, main_tex, engine=engine)
+            except BuildError as e:
+                errors.append(str(e))
+            else:
+                elapsed = time.perf_counter() - start
+                if i >= warmup:
+                    times.append(elapsed)
+                    passes.append(n)
+                    sizes.append((main_tex.parent / "main.pdf").stat().st_size)
+            # 失敗した回の作業フォルダも残さない（回数が多いと一時領域を使い切る）
+            shutil.rmtree(main_tex.parent, ignore_errors=True)
+    return {"engine": engine, "times": times, "passes": passes, "sizes": sizes, "errors": errors}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="コンパイルエンジンの比較（中央値 / p95 / パス数 / PDFサイズ）")
+    ap.add_argument("items", nargs=2, help="科目コード ディレクトリ名")
+    ap.add_argument("--engines", default=",".join(engines.ENGINES), help="カンマ区切り")
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--warmup", type=int, default=1, help="集計しない最初の実行回数")
+    ap.add_argument("--save", action="store_true", help="講義フォルダ内の build を入力に使う（--save でビルドした場合）")
+    args = ap.parse_args()
+
+    import build_slides1
+
+    subj_code, tdir_name = args.items
+    names = [e.strip() for e in args.engines.split(",") if e.strip()]
+    unknown = [e for e in names if e not in engines.ENGINES]
+    if unknown:
+        print(f"❌ 不明なエンジン: {', '.join(unknown)}（{', '.join(engines.ENGINES)}）", file=sys.stderr); sys.exit(1)
+
+    try:
+        if args.save:
+            tagdir = build_slides1.lesson_dir(subj_code, tdir_name)
+            if not tagdir: sys.exit(1)
+            src = Path(build_slides1.get_sourcedir()) / tagdir / "build"
+        else:
+            src = build_slides1.local_build_dir(subj_code, tdir_name)
+    except BuildError as e:
+        print_error(e); sys.exit(1)
+    if not (src / "main.tex").exists():
+        print(f"❌ {src}/main.tex がありません。先に build_slides1.py でビルドしてください。", file=sys.stderr); sys.exit(1)
+
+    print(f"📊 {subj_code}/{tdir_name}: {', '.join(names)} × {args.runs}回 (warmup {args.warmup})")
+    print(f"{'engine':<10}{'median':>10}{'p95':>10}{'min':>10}{'passes':>8}{'size(KB)':>10}  errors")
+    for name in names:
+        r = bench(src, name, args.runs, args.warmup)
+        if r["times"]:
+            print(f"{name:<10}{statistics.median(r['times']):>9.2f}s{p95(r['times']):>9.2f}s{min(r['times']):>9.2f}s"
+                  f"{statistics.median(r['passes']):>8g}{statistics.median(r['sizes']) / 1024:>10.0f}  {len(r['errors'])}")
+        else:
+            print(f"{name:<10}{'-':>10}{'-':>10}{'-':>10}{'-':>8}{'-':>10}  {len(r['errors'])}")
+        for msg in sorted(set(r["errors"])):
+            print(f"    ❌ {msg}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+# engines.py — LaTeX のコンパイル方法（エンジン）の切り替え
+#
+#   latexmk  : latexmk -lualatex（既定）。再実行の判断は latexmk に任せる
+#   lualatex : lualatex を直接実行し、.aux / .nav などが変わらなくなるまで再実行する
+#   fmt      : プリアンブルを mylatexformat で .fmt にして成果物ストア (localcache) に入れ、
+#              2回目以降はプリアンブルの読み込みを省く（試験的。作れないときは lualatex と同じ動作）
+#
+# エンジンは実行するコマンドを1つずつ返すジェネレータ commands() を持つ。
+# 実行と出力の監視は呼び出し側 (build_slides1.run_latexmk) が行い、終わるたびに次のコマンドを求める。
+# コマンドが失敗したときはその LatexError をジェネレータに throw する（タイムアウトは除く）。
+# 処理しなければそのままビルドの失敗になる。
+# どのエンジンを既定にするかは enginebench.py の計測結果で決める。
+from __future__ import annotations
+
+import abc
+import functools
+import hashlib
+import re
+import subprocess
+from collections.abc import Iterator
+from pathlib import Path
+
+import localcache
+from builderrors import LatexError
+
+DEFAULT = "latexmk"
+
+_TEX_FLAGS = ["-shell-escape", "-interaction=nonstopmode", "-halt-on-error"]
+_AUX_EXTS = (".aux", ".nav", ".toc", ".snm", ".out")
+_RERUN_RE = re.compile(r"Rerun to get|Label\(s\) may have changed|Please rerun LaTeX")
+
+
+class Engine(abc.ABC):
+    name = ""
+
+    @abc.abstractmethod
+    def commands(self, build_dir: Path, main_tex: Path) -> Iterator[list[str]]:
+        """実行するコマンドを順に返す"""
+
+
+class LatexmkEngine(Engine):
+    name = "latexmk"
+
+    def commands(self, build_dir: Path, main_tex: Path) -> Iterator[list[str]]:
+        yield ["latexmk", "-lualatex", *_TEX_FLAGS, f"-outdir={build_dir.as_posix()}", main_tex.as_posix()]
+
+
+def _aux_state(build_dir: Path, stem: str) -> str:
+    h = hashlib.sha256()
+    for ext in _AUX_EXTS:
+        p = build_dir / (stem + ext)
+        h.update(p.read_bytes() if p.exists() else b"-")
+    return h.hexdigest()
+
+
+class LualatexEngine(Engine):
+    """latexmk と同じく、補助ファイルが変わらなくなるか再実行の指示が消えるまで実行する"""
+    name = "lualatex"
+    max_runs = 4
+
+    def lualatex(self, build_dir: Path, main_tex: Path, *extra: str) -> list[str]:
+        return ["lualatex", *extra, *_TEX_FLAGS, f"-output-directory={build_dir.as_posix()}", main_tex.as_posix()]
+
+    def reruns(self, build_dir: Path, main_tex: Path, *extra: str) -> Iterator[list[str]]:
+        log = build_dir / f"{main_tex.stem}.log"
+        for _ in range(self.max_runs):
+            before = _aux_state(build_dir, main_tex.stem)
+            yield self.lualatex(build_dir, main_tex, *extra)
+            rerun = log.exists() and _RERUN_RE.search(log.read_text(encoding="utf-8", errors="replace"))
+            if not rerun and _aux_state(build_dir, main_tex.stem) == before:
+                return
+
+    def commands(self, build_dir: Path, main_tex: Path) -> Iterator[list[str]]:
+        yield from self.reruns(build_dir, main_tex)
+
+
+@functools.lru_cache(maxsize=1)
+def _lualatex_version() -> str:
+    try:
+        out = subprocess.run(["lualatex", "--version"], capture_output=True, text=True, timeout=30).stdout
+    except (OSError, subprocess.TimeoutExpired):
+        return ""
+    return out.split("\n", 1)[0]
+
+
+def preamble_key(build_dir: Path, main_tex: Path) -> str:
+    """main.tex の \\begin{document} より前と、build_dir の配備済みサブファイル、lualatex の版から作るキー"""
+    h = hashlib.sha256(_lualatex_version().encode())
+    h.update(main_tex.read_text(encoding="utf-8").split(r"\begin{document}", 1)[0].encode())
+    for p in sorted(build_dir.glob("*.tex")) + sorted(build_dir.glob("*.sty")):
+        if p.name == main_tex.name: continue
+        h.update(p.name.encode()); h.update(p.read_bytes())
+    return h.hexdigest()[:20]
+
+
+class FormatEngine(LualatexEngine):
+    """
+    mylatexformat でプリアンブルを .fmt にダンプして使う。
+    LuaTeX は Lua の状態を .fmt に保存できないため、luaotfload で読んだフォントが使えない版もある。
+    .fmt の作成に失敗したときは警告を出して通常の lualatex の実行に切り替える。
+    """
+    name = "fmt"
+
+    def format_command(self, build_dir: Path, main_tex: Path, fmt_name: str) -> list[str]:
+        """build_dir に fmt_name.fmt を作るコマンド"""
+        return ["lualatex", "-ini", f"-jobname={fmt_name}", *_TEX_FLAGS, f"-output-directory={build_dir.as_posix()}",
+                "&lualatex", "mylatexformat.ltx", main_tex.as_posix()]
+
+    def commands(self, build_dir: Path, main_tex: Path) -> Iterator[list[str]]:
+        key = preamble_key(build_dir, main_tex)
+        fmt_name = f"preamble-{key}"
+        local = build_dir / f"{fmt_name}.fmt"
+        store = localcache.ArtifactStore()
+        if not local.exists() and not store.fetch("formats", key, local):
+            # 作れなかったプリアンブルは印を残し、毎回作り直しを試みない。
+            # .fmt の作成も他のコマンドと同じく呼び出し側の制限時間の中で実行する。タイムアウトは
+            # ここには渡されずビルドの失敗になるので、一時的な遅さで印が付くことはない
+            if store.get("formats", key + ".failed") is None:
+                try:
+                    yield self.format_command(build_dir, main_tex, fmt_name)
+                except LatexError:
+                    local.unlink(missing_ok=True)
+                if not local.exists():
+                    store.put_bytes("formats", key + ".failed", b"")
+            if not local.exists():
+                print("⚠️ .fmt を作れなかったため、通常の lualatex で実行します")
+                yield from self.reruns(build_dir, main_tex)
+                return
+            store.put_file("formats", key, local)
+        # -fmt の探索先にはカレントディレクトリ (build_dir) が含まれる
+        yield from self.reruns(build_dir, main_tex, f"-fmt={fmt_name}")
+
+
+ENGINES: dict[str, type[Engine]] = {e.name: e for e in (LatexmkEngine, LualatexEngine, FormatEngine)}
+
+
+def get(name: str) -> Engine:
+    return ENGINES[name]()
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+
+# fonts.py — テンプレートが使うフォントの事前確認と、フォント読み込み時間の計測
+#
+#   python fonts.py warmup           # luaotfload のフォント名データベースを更新し、各フォントを一度読み込む
+#   python fonts.py warmup --force   # データベースを作り直す（フォントを追加・変更したとき）
+#   python fonts.py check            # テンプレートのフォントがこのマシンで見つかるか確認する
+#
+# 新しいマシンやフォント変更の直後は、最初のビルドで luaotfload がフォント名データベースを作り、
+# 大きな CJK フォントをキャッシュするため数分かかる（run_latexmk の中で止まったように見える）。
+# warmup でそれを先に済ませておく。
+# ビルド時には、見つからないフォントがあれば LaTeX を起動する前に知らせる。確認結果（フォントの
+# ファイルパス）はローカルキャッシュに覚えておき、ファイルが残っていれば luaotfload-tool を呼ばない。
+# 読み込み時間は preamble.tex の %@@fontload_*@@ に入れた \directlua の計測で fontload.tsv に書かれる。
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import localcache
+from builderrors import BuildError, PreflightError, print_error
+
+TSV_FILE = "fontload.tsv"
+CACHE_FILE = "fonts.json"
+
+_COMMENT_RE = re.compile(r"(?<!\\)%.*$", re.MULTILINE)
+_FONT_CMD_RE = re.compile(
+    r"\\(?:set(?:main|sans|mono)j?font|newj?fontfamily\s*\\\w+)\s*(?:\[([^\]]*)\])?\s*\{([^}]*)\}\s*(?:\[([^\]]*)\])?")
+_FONT_OPT_RE = re.compile(r"(?:Bold|Italic|BoldItalic)Font\s*=\s*(?:\{([^}]*)\}|([^,\]]+))")
+_RESOLVED_RE = re.compile(r'Resolved file name "([^"]+)"')
+
+# 読み込み時間の計測（TeX の % を使わずに書くため、タブと改行は string.char で出す）
+def _mark(phase: str) -> str:
+    return (rf'\directlua{{local f = io.open("{TSV_FILE}", "a") f:write("{phase}", string.char(9), '
+            rf'math.floor((os.gettimeofday() - build_slide_fontload_t) * 1000000), string.char(10)) f:close()}}')
+
+_START = r"\directlua{build_slide_fontload_t = os.gettimeofday()}"
+
+PLACEHOLDERS = {
+    # フォント関係のパッケージ読み込みと \set..jfont
+    "%@@fontload_begin@@": _START,
+    "%@@fontload_end@@": _mark("packages"),
+    # 設定したフォントを \begin{document} で1度使い、実際の読み込み時間を測る
+    "%@@fontload_use@@": (r"\AtBeginDocument{" + _START
+                          + r"\setbox0\hbox{\sffamily あa\bfseries あa\normalfont あa\ttfamily a}" + _mark("first-use") + "}"),
+}
+
+
+def apply_placeholders(content: str) -> str:
+    for k, v in PLACEHOLDERS.items():
+        content = content.replace(k, v)
+    return content
+
+
+def template_fonts(template_dir: Path) -> list[str]:
+    """テンプレートの \\set..font / \\new..fontfamily で指定されたフォント名（BoldFont= なども含む）"""
+    names: dict[str, None] = {}
+    for p in sorted(template_dir.glob("*.tex")) + sorted(template_dir.glob("*.sty")):
+        text = _COMMENT_RE.sub("", p.read_text(encoding="utf-8"))
+        for pre, name, post in _FONT_CMD_RE.findall(text):
+            names.setdefault(name.strip(), None)
+            for a, b in _FONT_OPT_RE.findall(f"{pre},{post}"):
+                names.setdefault((a or b).strip(), None)
+    return [n for n in names if n and "\\" not in n]
+
+
+def find_font(name: str) -> str | None:
+    """
+    luaotfload-tool で名前を解決する。見つかればファイルパス（不明なら ""）、なければ None。
+    データベースの作成が終わらないときは PreflightError を送出する。
+    """
+    try:
+        proc = subprocess.run(["luaotfload-tool", f"--find={name}"], capture_output=True,
+                              text=True, errors="replace", timeout=900)
+    except subprocess.TimeoutExpired as e:
+        raise PreflightError(f"luaotfload-tool が {e.timeout:.0f} 秒で終わりませんでした（フォントの確認中）",
+                             [f"{name}: python fonts.py warmup でフォント名データベースを先に作成してください"]) from e
+    out = proc.stdout + proc.stderr
+    if proc.returncode != 0 or "Cannot find" in out:
+        return None
+    m = _RESOLVED_RE.search(out)
+    return m.group(1) if m else ""
+
+
+def check_fonts(template_dir: Path, use_cache: bool = True) -> list[str] | None:
+    """
+    見つからないフォント名のリストを返す。luaotfload-tool がなければ None（確認しない）。
+    前回見つかったフォントは、そのファイルが残っていれば調べ直さない。
+    ファイルパスが分からなかったフォントは覚えず、毎回調べ直す。
+    """
+    if not shutil.which("luaotfload-tool"):
+        return None
+    cache_path = localcache.cache_root() / CACHE_FILE
+    try:
+        cache = json.loads(cache_path.read_text(encoding="utf-8")) if use_cache else {}
+    except (FileNotFoundError, ValueError):
+        cache = {}
+
+    missing, changed = [], False
+    for name in template_fonts(template_dir):
+        path = cache.get(name)
+        if path and os.path.exists(path):
+            continue
+        print(f"🔤 フォントを確認中: {name}")
+        found = find_font(name)
+        if found is None:
+            missing.append(name)
+        if found:
+            cache[name] = found
+            changed = True
+        elif cache.pop(name, None) is not None:
+            changed = True
+
+    if changed:
+        tmp = localcache.tmp_path(cache_path)
+        tmp.write_text(json.dumps(cache, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp, cache_path)
+    return missing
+
+
+def read_fontload(build_dir: Path) -> list[dict[str, float]]:
+    """
+    fontload.tsv をパスごとの {phase: 秒} のリストで返す。
+    --engine fmt ではプリアンブルが .fmt に入っていて packages の行がない（.fmt を作った回だけある）ので、
+    同じ phase がもう一度出てきたら次のパスとする。
+    """
+    tsv = build_dir / TSV_FILE
+    passes: list[dict[str, float]] = []
+    if not tsv.exists(): return passes
+    for line in tsv.read_text(encoding="utf-8").splitlines():
+        cols = line.split("\t")
+        if len(cols) != 2: continue
+        if cols[0] == "packages" or not passes or cols[0] in passes[-1]:
+            passes.append({})
+        passes[-1][cols[0]] = int(cols[1]) / 1e6
+    return passes
+
+
+def report(build_dir: Path) -> None:
+    passes = read_fontload(build_dir)
+    if not passes: return
+    parts = []
+    for i, p in enumerate(passes, 1):
+        total = sum(p.values())
+        parts.append(f"pass{i} {total:.2f}秒 (パッケージ {p.get('packages', 0):.2f} / 初回使用 {p.get('first-use', 0):.2f})")
+    print("🔤 フォント読み込み: " + ", ".join(parts))
+    if passes[0] and sum(passes[0].values()) > 30:
+        print("   初回のフォント読み込みに時間がかかっています。python fonts.py warmup で事前に済ませられます")
+
+
+def _warmup_document(names: list[str], template_dir: Path) -> str:
+    """テンプレートのフォント設定行をそのまま使い、各ファミリーの太字・細字を1文字ずつ組む文書"""
+    lines = []
+    for p in sorted(template_dir.glob("*.tex")):
+        for line in _COMMENT_RE.sub("", p.read_text(encoding="utf-8")).splitlines():
+            if _FONT_CMD_RE.search(line): lines.append(line.strip())
+    return "\n".join([
+        r"\documentclass{article}",
+        r"\usepackage{luatexja}",
+        r"\usepackage{luatexja-fontspec}",
+        *lines,
+        r"\begin{document}",
+        r"あa\textbf{あa} {\sffamily あa\textbf{あa}} {\ttfamily a}",
+        r"\end{document}",
+    ]) + "\n"
+
+
+def warmup(template_dir: Path, force: bool = False) -> bool:
+    if not shutil.which("luaotfload-tool"):
+        print("❌ luaotfload-tool が見つかりません（TeX Live の bin を PATH に入れてください）", file=sys.stderr)
+        return False
+
+    start = time.perf_counter()
+    print("🔤 luaotfload のフォント名データベースを更新します" + ("（作り直し）" if force else ""))
+    subprocess.run(["luaotfload-tool", "--update", *(["--force"] if force else [])])
+    print(f"   {time.perf_counter() - start:.1f}秒")
+
+    names = template_fonts(template_dir)
+    missing = check_fonts(template_dir, use_cache=False) or []
+    for name in names:
+        print(f"  {'❌' if name in missing else '✅'} {name}")
+    if missing:
+        print(f"❌ 見つからないフォントがあります: {', '.join(missing)}", file=sys.stderr)
+        return False
+
+    # 一度読み込んで CJK フォントのキャッシュを作る
+    t = time.perf_counter()
+    with tempfile.TemporaryDirectory(prefix="fontwarmup-") as tmp:
+        (Path(tmp) / "warmup.tex").write_text(_warmup_document(names, template_dir), encoding="utf-8")
+        proc = subprocess.run(["lualatex", "-interaction=nonstopmode", "-halt-on-error", "warmup.tex"],
+                              cwd=tmp, capture_output=True, text=True, errors="replace")
+    if proc.returncode != 0:
+        print("❌ フォントの読み込みに失敗しました", file=sys.stderr)
+        print("\n".join(proc.stdout.splitlines()[-15:]), file=sys.stderr)
+        return False
+    print(f"✅ フォントのキャッシュ作成: {time.perf_counter() - t:.1f}秒 (合計 {time.perf_counter() - start:.1f}秒)")
+    return True
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="テンプレートのフォントの事前確認")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("warmup", help="フォント名データベースとフォントのキャッシュを作る")
+    p.add_argument("--force", action="store_true", help="データベースを作り直す")
+    sub.add_parser("check", help="テンプレートのフォントが見つかるか確認する")
+    args = ap.parse_args()
+
+    template_dir = Path(__file__).absolute().parent.parent / "templates"
+    try:
+        if args.cmd == "warmup":
+            if not warmup(template_dir, args.force): sys.exit(1)
+        elif args.cmd == "check":
+            missing = check_fonts(template_dir, use_cache=False)
+            if missing is None:
+                print("⚠️ luaotfload-tool が見つからないため確認できません"); return
+            for name in template_fonts(template_dir):
+                print(f"  {'❌' if name in missing else '✅'} {name}")
+            if missing: sys.exit(1)
+    except BuildError as e:
+        print_error(e); sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
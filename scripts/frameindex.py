@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+
+# frameindex.py — 全授業の content.tex からフレームを集めた検索インデックス（SQLite FTS5）
+#
+#   python frameindex.py update              # 変更された content.tex だけ再インデックス
+#   python frameindex.py search 構造体       # タイトル・本文・絵文字/画像名を全文検索
+#   python frameindex.py show 123            # フレームのソースをそのまま表示（貼り付け用）
+#
+# インデックスはローカルのキャッシュフォルダ (localcache.cache_root()) に置くので、
+# 検索時に NAS へはアクセスしない。
+from __future__ import annotations
+
+import argparse
+import hashlib
+import re
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+import localcache
+from builderrors import BuildError, print_error
+
+DB_NAME = "frames.sqlite3"
+
+_COMMENT_RE = re.compile(r"(?<!\\)%.*$", re.MULTILINE)
+_ENV_RE = re.compile(r"\\(?:begin|end)\{[^}]*\}")
+_CMD_RE = re.compile(r"\\[a-zA-Z@]+\*?")
+_EMJ_RE = re.compile(r"\\emj(\w+)")
+_IMG_RE = re.compile(r"\\includegraphics(?:\[[^\]]*\])?\{([^}]*)\}")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path     TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size     INTEGER NOT NULL,
+    sha      TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS frames (
+    id      INTEGER PRIMARY KEY,
+    path    TEXT NOT NULL,
+    ordinal INTEGER NOT NULL,
+    line    INTEGER NOT NULL,
+    title   TEXT NOT NULL,
+    emj     TEXT NOT NULL,
+    images  TEXT NOT NULL,
+    sha     TEXT NOT NULL,
+    source  TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS frames_path ON frames(path);
+CREATE INDEX IF NOT EXISTS frames_sha ON frames(sha);
+"""
+
+
+def plain_text(frame_tex: str) -> str:
+    """検索用に、コメントと LaTeX コマンド名・括弧を取り除いた本文"""
+    s = _COMMENT_RE.sub("", frame_tex)
+    s = _ENV_RE.sub(" ", s)
+    s = _CMD_RE.sub(" ", s)
+    s = re.sub(r"[{}\[\]]", " ", s)
+    return " ".join(s.split())
+
+
+def connect(db_path: Path | None = None) -> sqlite3.Connection:
+    db = sqlite3.connect(db_path or localcache.cache_root() / DB_NAME)
+    db.executescript(_SCHEMA)
+    try:
+        # 日本語は単語区切りがないので trigram を使う（SQLite 3.34 以降）
+        db.execute("CREATE VIRTUAL TABLE IF NOT EXISTS frames_fts USING fts5(title, body, refs, tokenize='trigram')")
+    except sqlite3.OperationalError:
+        db.execute("CREATE VIRTUAL TABLE IF NOT EXISTS frames_fts USING fts5(title, body, refs)")
+    return db
+
+
+def _index_file(db: sqlite3.Connection, rel: str, text: str) -> int:
+    import build_slides1
+
+    for (fid,) in db.execute("SELECT id FROM frames WHERE path = ?", (rel,)).fetchall():
+        db.execute("DELETE FROM frames_fts WHERE rowid = ?", (fid,))
+    db.execute("DELETE FROM frames WHERE path = ?", (rel,))
+
+    pos = build_slides1.find_frame_positions(text)
+    for n, (a, b) in enumerate(pos, 1):
+        src = text[a:b]
+        title = build_slides1.frame_title(src)
+        emj = " ".join(sorted(set(_EMJ_RE.findall(src))))
+        images = " ".join(sorted(set(_IMG_RE.findall(src))))
+        sha = hashlib.sha256(src.encode("utf-8")).hexdigest()[:16]
+        cur = db.execute(
+            "INSERT INTO frames (path, ordinal, line, title, emj, images, sha, source) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (rel, n, text.count("\n", 0, a) + 1, title, emj, images, sha, src))
+        db.execute("INSERT INTO frames_fts (rowid, title, body, refs) VALUES (?, ?, ?, ?)",
+                   (cur.lastrowid, title, plain_text(src), f"{emj} {images}"))
+    return len(pos)
+
+
+def update(db: sqlite3.Connection, source_root: Path) -> None:
+    """
+    source_root/<科目>/<コマ>/content.tex を走査し、変更されたファイルだけ再インデックスする。
+    mtime とサイズが同じなら読まない。読んだ結果ハッシュが同じなら mtime だけ更新する。
+    """
+    start = time.perf_counter()
+    known = {row[0]: row[1:] for row in db.execute("SELECT path, mtime_ns, size, sha FROM files")}
+    seen: set[str] = set()
+    changed = frames = 0
+
+    for path in sorted(source_root.glob("*/*/content.tex")):
+        rel = path.relative_to(source_root).as_posix()
+        seen.add(rel)
+        st = path.stat()
+        old = known.get(rel)
+        if old and old[0] == st.st_mtime_ns and old[1] == st.st_size:
+            continue
+        text = path.read_text(encoding="utf-8", errors="replace")
+        sha = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        if not old or old[2] != sha:
+            frames += _index_file(db, rel, text)
+            changed += 1
+        db.execute("INSERT OR REPLACE INTO files (path, mtime_ns, size, sha) VALUES (?, ?, ?, ?)",
+                   (rel, st.st_mtime_ns, st.st_size, sha))
+
+    removed = set(known) - seen
+    for rel in removed:
+        _index_file(db, rel, "")
+        db.execute("DELETE FROM files WHERE path = ?", (rel,))
+    db.commit()
+
+    print(f"✅ インデックス更新: {len(seen)} files ({changed} 更新 / {frames} frames, {len(removed)} 削除)"
+          f" {time.perf_counter() - start:.2f}秒")
+
+
+def search(db: sqlite3.Connection, query: str, limit: int = 20) -> list[tuple]:
+    """(id, path, line, title, 抜粋, 同一フレーム数) のリストを関連度順に返す"""
+    if len(query) >= 3:
+        phrase = '"' + query.replace('"', '""') + '"'
+        sql = """
+            SELECT f.id, f.path, f.line, f.title,
+                   snippet(frames_fts, 1, '[', ']', '…', 12),
+                   (SELECT COUNT(*) FROM frames g WHERE g.sha = f.sha)
+            FROM frames_fts JOIN frames f ON f.id = frames_fts.rowid
+            WHERE frames_fts MATCH ? ORDER BY rank LIMIT ?"""
+        return db.execute(sql, (phrase, limit)).fetchall()
+    # trigram は 3 文字未満を検索できないので LIKE で探す
+    like = f"%{query}%"
+    sql = """
+        SELECT f.id, f.path, f.line, f.title, substr(t.body, 1, 40),
+               (SELECT COUNT(*) FROM frames g WHERE g.sha = f.sha)
+        FROM frames_fts t JOIN frames f ON f.id = t.rowid
+        WHERE t.title LIKE ? OR t.body LIKE ? OR t.refs LIKE ? LIMIT ?"""
+    return db.execute(sql, (like, like, like, limit)).fetchall()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="全授業のフレーム検索インデックス")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("update", help="インデックスを更新する")
+    p = sub.add_parser("search", help="フレームを検索する")
+    p.add_argument("query")
+    p.add_argument("--limit", type=int, default=20)
+    p = sub.add_parser("show", help="フレームのソースを表示する")
+    p.add_argument("id", type=int)
+    args = ap.parse_args()
+
+    db = connect()
+    if args.cmd == "update":
+        import build_slides1
+        try:
+            update(db, Path(build_slides1.get_sourcedir()))
+        except BuildError as e:
+            print_error(e); sys.exit(1)
+    elif args.cmd == "search":
+        start = time.perf_counter()
+        rows = search(db, args.query, args.limit)
+        for fid, path, line, title, snip, dup in rows:
+            dup_info = f" (同一 {dup} 件)" if dup > 1 else ""
+            print(f"[{fid:>5}] {path}:{line}  {title}{dup_info}")
+            print(f"        {snip}")
+        print(f"🔍 {len(rows)} 件 ({(time.perf_counter() - start) * 1000:.1f}ms)", file=sys.stderr)
+    elif args.cmd == "show":
+        row = db.execute("SELECT path, line, source FROM frames WHERE id = ?", (args.id,)).fetchone()
+        if not row:
+            print(f"❌ フレームが見つかりません: {args.id}", file=sys.stderr); sys.exit(1)
+        print(f"% from {row[0]}:{row[1]}", file=sys.stderr)
+        print(row[2])
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
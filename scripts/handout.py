@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+# handout.py — プレゼン用PDF (_pr.pdf) からハンズアウトPDFを作る（LaTeX は実行しない）
+#
+#   python handout.py 1020701 02            # 1ページ1フレーム
+#   python handout.py 1020701 02 --nup 4    # A4 に 4 フレーム
+#
+# .nav に記録されたフレームごとのページ範囲から、各フレームの最後のオーバーレイ
+# （すべて表示された状態）のページだけを取り出して並べる。
+# --ho の再コンパイルとの違い: \mypause 以外のオーバーレイ指定（\only<1> など）も
+# 最後の状態で出力される。
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import beamernav
+import localcache
+from builderrors import BuildError, MissingDependencyError, print_error
+
+try:
+    import pymupdf
+except ImportError:
+    pymupdf = None
+
+# nup ごとのレイアウト: (用紙, 横の数, 縦の数)
+_LAYOUTS = {2: ("a4", 1, 2), 4: ("a4-l", 2, 2)}
+_MARGIN = 28  # pt
+
+
+def last_overlay_pages(nav: Path) -> list[int]:
+    """各フレームの最終ページ（0始まり）を文書順に返す"""
+    return [last - 1 for _first, last in beamernav.frame_pages(nav)]
+
+
+def derive_handout(pr_pdf: Path, nav: Path, out_pdf: Path, nup: int = 1) -> int:
+    """pr_pdf から各フレームの最終ページを抜き出して out_pdf に書く。書いたフレーム数を返す。"""
+    if pymupdf is None:
+        raise MissingDependencyError("ハンズアウトの作成には PyMuPDF が必要です: pip install pymupdf")
+    if nup not in (1, *_LAYOUTS):
+        raise BuildError(f"--nup は 1 / 2 / 4 のいずれかです: {nup}")
+
+    pages = last_overlay_pages(nav)
+    try:
+        src = pymupdf.open(pr_pdf)
+        if not pages or pages[-1] >= src.page_count:
+            src.close()
+            raise BuildError(f"{nav.name} と {pr_pdf.name} のページ数が一致しません")
+
+        out = pymupdf.open()
+        if nup == 1:
+            for p in pages:
+                out.insert_pdf(src, from_page=p, to_page=p)
+        else:
+            paper, cols, rows = _LAYOUTS[nup]
+            w, h = pymupdf.paper_size(paper)
+            cell_w, cell_h = (w - _MARGIN * 2) / cols, (h - _MARGIN * 2) / rows
+            for i, p in enumerate(pages):
+                if i % nup == 0:
+                    sheet = out.new_page(width=w, height=h)
+                r, c = divmod(i % nup, cols)
+                x0, y0 = _MARGIN + c * cell_w, _MARGIN + r * cell_h
+                cell = pymupdf.Rect(x0, y0, x0 + cell_w, y0 + cell_h) + (6, 6, -6, -6)
+                sheet.show_pdf_page(cell, src, p)  # 縦横比は保ったまま中央に配置される
+                sheet.draw_rect(cell, color=(0.8, 0.8, 0.8), width=0.5)
+
+        tmp = localcache.tmp_path(out_pdf)
+        out.save(tmp, garbage=3, deflate=True)
+        out.close(); src.close()
+        tmp.replace(out_pdf)
+    except RuntimeError as e:  # PyMuPDF の例外（FileDataError など）
+        raise BuildError(f"ハンズアウトの作成に失敗しました: {e}") from e
+    return len(pages)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="プレゼン用PDFからハンズアウトPDFを作る")
+    ap.add_argument("items", nargs=2, help="科目コード ディレクトリ名")
+    ap.add_argument("--nup", type=int, default=1, choices=[1, 2, 4])
+    ap.add_argument("--title", default=None)
+    args = ap.parse_args()
+
+    import build_slides1
+
+    subj_code, tdir_name = args.items
+    try:
+        tagdir = build_slides1.lesson_dir(subj_code, tdir_name)
+        if not tagdir: sys.exit(1)
+        app_dir = Path(build_slides1.get_sourcedir()) / tagdir
+        stitle = args.title or build_slides1.slideinfo.slidetitle(subj_code, tdir_name)
+        pr_pdf = app_dir / f"{tdir_name}_{stitle}_pr.pdf"
+        if not pr_pdf.exists():
+            print(f"❌ プレゼン用PDFがありません: {pr_pdf}", file=sys.stderr); sys.exit(1)
+
+        # 直前のビルドの中間ファイルから .nav を探す。その main.pdf が _pr.pdf と
+        # 同じもの（copy2 でサイズと更新時刻が一致）でなければ使えない。
+        for build_dir in (build_slides1.local_build_dir(subj_code, tdir_name), app_dir / "build"):
+            nav, built = build_dir / "main.nav", build_dir / "main.pdf"
+            if nav.exists() and built.exists():
+                a, b = built.stat(), pr_pdf.stat()
+                if a.st_size == b.st_size and int(a.st_mtime) == int(b.st_mtime):
+                    break
+        else:
+            print("❌ _pr.pdf に対応する main.nav が見つかりません。プレゼン用ビルドをやり直してください。", file=sys.stderr)
+            sys.exit(1)
+
+        start = time.perf_counter()
+        out_pdf = app_dir / f"{tdir_name}_{stitle}.pdf"
+        n = derive_handout(pr_pdf, nav, out_pdf, nup=args.nup)
+        print(f"📝 出力: {out_pdf} ({n} frames, {time.perf_counter() - start:.2f}秒)")
+    except BuildError as e:
+        print_error(e); sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
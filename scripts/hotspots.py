@@ -0,0 +1,96 @@
+# hotspots.py — フレームごとのコンパイル時間とオーバーレイ枚数を計測する（--profile）
+#
+# main.tex に組み込む本文の各フレームの前後へ \directlua の計測マーカーを差し込み、
+# LuaTeX 側で経過時間と出力ページ数を frame_profile.tsv に書き出す。
+# latexmk は複数パス実行するが、ファイルはパスごとに書き直されるので最後のパスの値が残る。
+from __future__ import annotations
+
+from pathlib import Path
+
+LUA_FILE = "build_slide_profile.lua"
+TSV_FILE = "frame_profile.tsv"
+
+_LUA_SOURCE = f"""\
+-- build_slides1.py --profile が生成する計測用スクリプト
+build_slide_profile = build_slide_profile or {{}}
+local P = build_slide_profile
+local out = io.open("{TSV_FILE}", "w")
+local t0, p0 = {{}}, {{}}
+
+function P.start(i)
+  t0[i] = os.gettimeofday()
+  p0[i] = tex.count["c@page"]
+end
+
+function P.stop(i)
+  local dt = os.gettimeofday() - t0[i]
+  local pages = tex.count["c@page"] - p0[i]
+  out:write(string.format("%d\\t%.6f\\t%d\\n", i, dt, pages))
+  out:flush()
+end
+"""
+
+
+def write_lua(build_dir: Path) -> None:
+    (build_dir / LUA_FILE).write_text(_LUA_SOURCE, encoding="utf-8")
+
+
+def instrument_body(body: str, positions: list[tuple[int, int]]) -> str:
+    """
+    body の各フレーム（positions は find_frame_positions(body) の結果）を
+    計測マーカーで挟んだ本文を返す。フレーム番号は 1 始まり。
+    """
+    parts = [rf'\directlua{{dofile("{LUA_FILE}")}}' + "\n"]
+    prev = 0
+    for i, (a, b) in enumerate(positions, 1):
+        parts.append(body[prev:a])
+        # [fragile] のフレームは \end{frame} が単独の行にないと終わりを見つけられないので、マーカーは別の行に置く
+        parts.append(("" if a == 0 or body[a - 1] == "\n" else "\n")
+                     + rf"\directlua{{build_slide_profile.start({i})}}" + "\n")
+        parts.append(body[a:b])
+        parts.append("\n" + rf"\directlua{{build_slide_profile.stop({i})}}" + ("" if body[b:b + 1] == "\n" else "\n"))
+        prev = b
+    parts.append(body[prev:])
+    return "".join(parts)
+
+
+def read_profile(build_dir: Path) -> dict[int, tuple[float, int]]:
+    """frame_profile.tsv を {フレーム番号: (秒, ページ数)} で返す"""
+    tsv = build_dir / TSV_FILE
+    result: dict[int, tuple[float, int]] = {}
+    if not tsv.exists(): return result
+    for line in tsv.read_text(encoding="utf-8").splitlines():
+        cols = line.split("\t")
+        if len(cols) != 3: continue
+        result[int(cols[0])] = (float(cols[1]), int(cols[2]))
+    return result
+
+
+def report(build_dir: Path, frames: list[dict], top: int = 0) -> None:
+    """
+    計測結果を時間の長い順に表示する。
+    frames は計測した順のフレーム情報で、各要素は {"page": --page での番号, "line": 行番号, "title": str}。
+    """
+    prof = read_profile(build_dir)
+    if not prof:
+        print(f"⚠️ 計測結果 ({TSV_FILE}) がありません")
+        return
+
+    rows = []
+    for i, info in enumerate(frames, 1):
+        if i in prof:
+            sec, pages = prof[i]
+            rows.append((sec, pages, info))
+    rows.sort(key=lambda r: r[0], reverse=True)
+    total = sum(r[0] for r in rows)
+
+    print("\n" + "=" * 65)
+    print("  ⏱️ フレーム別コンパイル時間（最終パス・長い順）")
+    print("-" * 65)
+    print(f"  {'page':>4} {'line':>5} {'sec':>7} {'share':>6} {'ovl':>4}  title")
+    for sec, pages, info in (rows[:top] if top else rows):
+        share = sec / total * 100 if total else 0.0
+        print(f"  {info['page']:>4} {info['line']:>5} {sec:>7.3f} {share:>5.1f}% {pages:>4}  {info['title']}")
+    print("-" * 65)
+    print(f"  合計 {total:.3f}秒 / {len(rows)} frames / {sum(r[1] for r in rows)} pages")
+    print("=" * 65 + "\n")
@@ -0,0 +1,215 @@
+# localcache.py — ローカルディスク上のキャッシュ置き場
+#
+# NAS ではなく、このマシンのユーザーキャッシュフォルダを使う。
+#   macOS : ~/Library/Caches/build_slide
+#   その他: $XDG_CACHE_HOME/build_slide (既定 ~/.cache/build_slide)
+# 環境変数 BUILD_SLIDE_CACHE_DIR で場所を変更できる。
+#
+# 後半の ArtifactStore は、フォーマット・ハイライト済みコード・サムネイルなどのビルド成果物を
+# 内容のハッシュで共有する容量上限つきのキャッシュ。
+from __future__ import annotations
+
+import os
+import shutil
+import sys
+import time
+import uuid
+from pathlib import Path
+
+
+def cache_root() -> Path:
+    env = os.environ.get("BUILD_SLIDE_CACHE_DIR")
+    if env:
+        root = Path(env)
+    elif sys.platform == "darwin":
+        root = Path.home() / "Library" / "Caches" / "build_slide"
+    else:
+        root = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "build_slide"
+    root.mkdir(parents=True, exist_ok=True)
+    return root
+
+
+def tmp_path(path: Path, prefix: str = "") -> Path:
+    """path を置き換えるための、同じフォルダの一時ファイル名（同じプロセスの別スレッドとも重ならない）"""
+    return path.with_name(f"{prefix}{path.name}.{os.getpid()}.{uuid.uuid4().hex}.tmp")
+
+
+# =========================
+#  成果物ストア（内容のハッシュをキーにした共有キャッシュ）
+# =========================
+#
+# cache_root()/objects/<種類>/<キーの先頭2文字>/<キー> に置く。
+#  ・書き込みは一時名 → os.replace なので、読む側が書きかけを見ることはない
+#  ・使うたびに更新時刻を今にして、容量を超えたら古いものから消す（LRU）
+#  ・削除 (gc) はロックファイルの排他ロック中だけ行う。並行ビルドが同時に gc しても安全
+#  ・上限は環境変数 BUILD_SLIDE_CACHE_MAX（例: 500M, 2G。既定 2G）
+#
+#   python localcache.py stats           # 種類ごとの件数と容量
+#   python localcache.py gc [--max 1G]   # 上限まで古いものから削除
+
+DEFAULT_MAX = "2G"
+_GC_INTERVAL = 600   # 自動 gc の間隔（秒）
+_GC_MIN_AGE = 60     # これより新しいものは消さない（使用中の可能性がある）
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+def parse_size(text: str) -> int:
+    units = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+    t = text.strip().upper().rstrip("B")
+    if t and t[-1] in units:
+        return int(float(t[:-1]) * units[t[-1]])
+    return int(t)
+
+
+def format_size(n: float) -> str:
+    for unit in ("B", "K", "M", "G"):
+        if n < 1024 or unit == "G":
+            return f"{n:.0f}{unit}" if unit == "B" else f"{n:.1f}{unit}"
+        n /= 1024
+    return f"{n:.1f}G"
+
+
+class ArtifactStore:
+    def __init__(self, root: Path | None = None, max_bytes: int | None = None):
+        self.root = root or cache_root() / "objects"
+        self.max_bytes = max_bytes if max_bytes is not None else parse_size(
+            os.environ.get("BUILD_SLIDE_CACHE_MAX") or DEFAULT_MAX)
+
+    def path(self, kind: str, key: str) -> Path:
+        return self.root / kind / key[:2] / key
+
+    def get(self, kind: str, key: str) -> Path | None:
+        """あればパスを返し、最終使用時刻を更新する。パスは gc で消えることがあるので fetch() を推奨"""
+        p = self.path(kind, key)
+        try:
+            os.utime(p)
+        except FileNotFoundError:
+            return None
+        return p
+
+    def fetch(self, kind: str, key: str, dst: Path) -> bool:
+        """
+        dst にハードリンク（できなければコピー）する。なければ False。
+        ハードリンクはストアと中身を共有するので、dst をその場で書き換えないこと（置き換えはよい）。
+        """
+        p = self.get(kind, key)
+        if p is None:
+            return False
+        tmp = tmp_path(dst)
+        try:
+            try:
+                os.link(p, tmp)
+            except OSError:
+                shutil.copyfile(p, tmp)
+        except FileNotFoundError:  # 直前に gc で消えた
+            return False
+        os.replace(tmp, dst)
+        return True
+
+    def read_bytes(self, kind: str, key: str) -> bytes | None:
+        p = self.get(kind, key)
+        try:
+            return p.read_bytes() if p else None
+        except FileNotFoundError:
+            return None
+
+    def _write(self, kind: str, key: str, write) -> Path:
+        p = self.path(kind, key)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        tmp = tmp_path(p)
+        write(tmp)
+        os.replace(tmp, p)
+        self.maybe_gc()
+        return p
+
+    def put_file(self, kind: str, key: str, src: Path) -> Path:
+        return self._write(kind, key, lambda tmp: shutil.copyfile(src, tmp))
+
+    def put_bytes(self, kind: str, key: str, data: bytes) -> Path:
+        return self._write(kind, key, lambda tmp: tmp.write_bytes(data))
+
+    def _objects(self) -> list[tuple[Path, os.stat_result]]:
+        out = []
+        for p in self.root.glob("*/*/*"):
+            if p.name.endswith(".tmp"): continue
+            try:
+                out.append((p, p.stat()))
+            except FileNotFoundError:
+                pass
+        return out
+
+    def stats(self) -> dict[str, tuple[int, int]]:
+        """{種類: (件数, バイト数)}"""
+        result: dict[str, tuple[int, int]] = {}
+        for p, st in self._objects():
+            kind = p.parent.parent.name
+            n, size = result.get(kind, (0, 0))
+            result[kind] = (n + 1, size + st.st_size)
+        return result
+
+    def gc(self, max_bytes: int | None = None) -> tuple[int, int]:
+        """合計が上限以下になるまで最終使用が古いものから消す。(削除件数, 削除バイト数) を返す"""
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.root / ".lock", "w") as lock:
+            if fcntl: fcntl.flock(lock, fcntl.LOCK_EX)
+            objects = sorted(self._objects(), key=lambda o: o[1].st_mtime)
+            total = sum(st.st_size for _, st in objects)
+            now, removed, freed = time.time(), 0, 0
+            for p, st in objects:
+                if total <= limit: break
+                if now - st.st_mtime < _GC_MIN_AGE: continue
+                try:
+                    p.unlink()
+                except FileNotFoundError:
+                    continue
+                total -= st.st_size; removed += 1; freed += st.st_size
+            # 一時ファイルの残骸（中断されたビルド）も片付ける
+            for p in self.root.glob("*/*/*.tmp"):
+                try:
+                    if now - p.stat().st_mtime > 3600: p.unlink()
+                except FileNotFoundError:
+                    pass
+            (self.root / ".last_gc").touch()
+        return removed, freed
+
+    def maybe_gc(self) -> None:
+        """前回の gc から _GC_INTERVAL 秒以上たっていれば gc する"""
+        try:
+            if time.time() - (self.root / ".last_gc").stat().st_mtime < _GC_INTERVAL: return
+        except FileNotFoundError:
+            pass
+        self.gc()
+
+
+def main() -> None:
+    import argparse
+
+    ap = argparse.ArgumentParser(description="ローカルの成果物キャッシュの管理")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("stats", help="種類ごとの件数と容量を表示する")
+    p = sub.add_parser("gc", help="上限を超えた分を古いものから削除する")
+    p.add_argument("--max", default=None, help="上限（例: 500M, 2G）。既定は BUILD_SLIDE_CACHE_MAX または 2G")
+    args = ap.parse_args()
+
+    store = ArtifactStore()
+    if args.cmd == "stats":
+        stats = store.stats()
+        total = sum(size for _, size in stats.values())
+        print(f"📦 {store.root}")
+        for kind, (n, size) in sorted(stats.items()):
+            print(f"  {kind:<12}{n:>8} 件 {format_size(size):>10}")
+        print(f"  {'合計':<10}{sum(n for n, _ in stats.values()):>8} 件 {format_size(total):>10}"
+              f" / 上限 {format_size(store.max_bytes)}")
+    elif args.cmd == "gc":
+        start = time.perf_counter()
+        removed, freed = store.gc(parse_size(args.max) if args.max else None)
+        print(f"🧹 {removed} 件 / {format_size(freed)} を削除 ({time.perf_counter() - start:.2f}秒)")
+
+
+if __name__ == "__main__":
+    main()
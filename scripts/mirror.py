@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+
+# mirror.py — 授業フォルダのローカルミラー（build_slides1.py --mirror / --offline）
+#
+#   python mirror.py sync 1020701 02      # ミラーを NAS に合わせる（オフラインにする前など）
+#   python mirror.py status               # NAS に未反映のビルド結果の一覧
+#   python mirror.py publish [1020701 [02]]  # ビルド結果を NAS にコピーし、台帳を更新する
+#
+# ミラーは localcache.cache_root()/mirror/<授業資料ルート相対のフォルダ> に置く。
+# ・ビルドの前に、サイズと更新時刻が違うファイルだけ NAS からコピーする（NAS で消えたファイルは消す）
+# ・\assetpath（@@sourcedir@@）はミラーを指すので、LuaLaTeX はコード・画像をローカルから読む
+# ・出力PDF・サムネイルはミラー側に書き、publish するまで NAS と台帳には触れない
+# ・NAS に届かないとき、--offline のときは、前回同期したミラーと授業情報でビルドする
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import localcache
+from builderrors import BuildError, SlideInfoError, print_error
+
+# ミラーしないもの（ミラー側で作るビルド結果）
+_SKIP_DIRS = {"build", "thumbs"}
+
+
+def mirror_root() -> Path:
+    root = localcache.cache_root() / "mirror"
+    root.mkdir(parents=True, exist_ok=True)
+    return root
+
+
+def _state_path(kind: str, subj_code: str, tdir_name: str) -> Path:
+    return mirror_root() / f".{kind}" / f"{subj_code}_{tdir_name}.json"
+
+
+def _write_json(path: Path, data: dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = localcache.tmp_path(path)
+    tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _read_json(path: Path) -> dict | None:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return None
+
+
+# build_slides1.py が出力する PDF の接尾辞（配布用 / プレゼン用 / 教師用 / ページ指定）
+_OUTPUT_SUFFIXES = ("", "_pr", "_tech", "_test")
+
+
+def _is_output(rel: Path, tdir_name: str, title: str) -> bool:
+    """授業フォルダ直下のビルド結果 (<tdir>_<title><接尾辞>.pdf) と build/・thumbs/"""
+    if rel.parts[0] in _SKIP_DIRS:
+        return True
+    return len(rel.parts) == 1 and rel.name in {f"{tdir_name}_{title}{s}.pdf" for s in _OUTPUT_SUFFIXES}
+
+
+def sync_tree(src: Path, dst: Path, tdir_name: str, title: str) -> tuple[int, int]:
+    """src の内容を dst に差分コピーする。(コピー数, 削除数) を返す"""
+    copied, seen = 0, set()
+    for dirpath, dirnames, filenames in os.walk(src):
+        base = Path(dirpath)
+        rel_dir = base.relative_to(src)
+        if rel_dir == Path("."):
+            dirnames[:] = [d for d in dirnames if d not in _SKIP_DIRS]
+        for name in filenames:
+            rel = rel_dir / name
+            if _is_output(rel, tdir_name, title) or name.startswith("."): continue
+            seen.add(rel)
+            s, d = base / name, dst / rel
+            st = s.stat()
+            try:
+                dt = d.stat()
+                if dt.st_size == st.st_size and dt.st_mtime_ns == st.st_mtime_ns: continue
+            except FileNotFoundError:
+                d.parent.mkdir(parents=True, exist_ok=True)
+            tmp = localcache.tmp_path(d)
+            shutil.copy2(s, tmp)
+            os.replace(tmp, d)
+            copied += 1
+
+    removed = 0
+    for dirpath, dirnames, filenames in os.walk(dst):
+        rel_dir = Path(dirpath).relative_to(dst)
+        if rel_dir == Path("."):
+            dirnames[:] = [d for d in dirnames if d not in _SKIP_DIRS]
+        for name in filenames:
+            rel = rel_dir / name
+            if rel in seen or _is_output(rel, tdir_name, title) or name.startswith("."): continue
+            (dst / rel).unlink()
+            removed += 1
+    return copied, removed
+
+
+def prepare(subj_code: str, tdir_name: str, offline: bool = False) -> tuple[Path, str, str]:
+    """
+    ミラーを NAS に合わせ、(ミラーのルート, 授業資料ルート相対のフォルダ, 題名) を返す。
+    NAS に届かないとき・offline のときは前回同期した内容をそのまま使う。
+    """
+    import build_slides1
+
+    meta_path = _state_path("meta", subj_code, tdir_name)
+    if not offline:
+        start = time.perf_counter()
+        try:
+            tagdir = build_slides1.lesson_dir(subj_code, tdir_name)
+            if not tagdir: raise SlideInfoError(f"授業フォルダが解決できません: {subj_code}/{tdir_name}")
+            title = build_slides1.slideinfo.slidetitle(subj_code, tdir_name)
+            src = Path(build_slides1.get_sourcedir()) / tagdir
+            if not (src / "content.tex").exists():
+                raise BuildError(f"content.tex がありません: {src / 'content.tex'}")
+            copied, removed = sync_tree(src, mirror_root() / tagdir, tdir_name, title)
+        except (BuildError, OSError) as e:
+            if _read_json(meta_path) is None:
+                if isinstance(e, BuildError): raise
+                raise BuildError(f"NAS の授業フォルダを同期できません: {e}") from e
+            print(f"⚠️ NAS に接続できないため、前回のミラーでビルドします: {e}")
+        else:
+            _write_json(meta_path, {"subject": subj_code, "lesson": tdir_name, "tagdir": tagdir, "title": title,
+                                    "synced_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")})
+            print(f"🪞 ミラー同期: {copied} コピー / {removed} 削除 ({time.perf_counter() - start:.2f}秒)"
+                  f" → {mirror_root() / tagdir}")
+            return mirror_root(), tagdir, title
+
+    meta = _read_json(meta_path)
+    if meta is None:
+        raise BuildError(f"ミラーがありません。先に NAS に接続して同期してください: python mirror.py sync {subj_code} {tdir_name}")
+    print(f"🪞 ミラーを使用（同期: {meta['synced_at']}）")
+    return mirror_root(), meta["tagdir"], meta["title"]
+
+
+def record_pending(subj_code: str, tdir_name: str, tagdir: str, outputs: list[Path]) -> None:
+    """publish で NAS に戻すビルド結果を記録する（台帳の更新もそのときに行う）"""
+    path = _state_path("pending", subj_code, tdir_name)
+    pending = _read_json(path) or {"subject": subj_code, "lesson": tdir_name, "tagdir": tagdir, "outputs": []}
+    for p in outputs:
+        rel = p.relative_to(mirror_root() / tagdir).as_posix()
+        if rel not in pending["outputs"]: pending["outputs"].append(rel)
+    pending["builds"] = pending.get("builds", 0) + 1
+    pending["built_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    _write_json(path, pending)
+    print(f"🪞 NAS への反映待ち: {subj_code}/{tdir_name}（python mirror.py publish で反映）")
+
+
+def pending_list(subj_code: str | None = None, tdir_name: str | None = None) -> list[dict]:
+    items = []
+    for p in sorted((mirror_root() / ".pending").glob("*.json")):
+        data = _read_json(p)
+        if not data: continue
+        if subj_code and data["subject"] != subj_code: continue
+        if tdir_name and data["lesson"] != tdir_name: continue
+        items.append(data)
+    return items
+
+
+def publish(item: dict) -> int:
+    """
+    1授業回のビルド結果を NAS にコピーし、台帳を反映待ちの間のビルド回数分更新する。
+    フォルダ（サムネイル）はミラー側にないファイルを NAS からも消す。コピーしたファイル数を返す。
+    """
+    import build_slides1
+
+    src = mirror_root() / item["tagdir"]
+    dst = Path(build_slides1.get_sourcedir()) / item["tagdir"]
+    if not dst.is_dir():
+        raise BuildError(f"NAS の授業フォルダがありません: {dst}")
+    files, dirs = [], []
+    for rel in item["outputs"]:
+        p = src / rel
+        if p.is_dir():
+            dirs.append(p)
+            files += sorted(f for f in p.rglob("*") if f.is_file())
+        elif p.exists():
+            files.append(p)
+    for f in files:
+        d = dst / f.relative_to(src)
+        d.parent.mkdir(parents=True, exist_ok=True)
+        tmp = localcache.tmp_path(d)
+        shutil.copy2(f, tmp)
+        os.replace(tmp, d)
+    copied = {dst / f.relative_to(src) for f in files}
+    for p in dirs:
+        for f in (dst / p.relative_to(src)).rglob("*"):
+            if f.is_file() and f not in copied:
+                f.unlink()
+    build_slides1.slideinfo.slideinfoupdate(item["subject"], item["lesson"], item.get("builds", 1))
+    _state_path("pending", item["subject"], item["lesson"]).unlink()
+    return len(files)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="授業フォルダのローカルミラー")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("sync", help="ミラーを NAS に合わせる")
+    p.add_argument("items", nargs=2, help="科目コード ディレクトリ名")
+    sub.add_parser("status", help="NAS に未反映のビルド結果を表示する")
+    p = sub.add_parser("publish", help="ビルド結果を NAS にコピーして台帳を更新する")
+    p.add_argument("subject", nargs="?")
+    p.add_argument("lesson", nargs="?")
+    args = ap.parse_args()
+
+    try:
+        if args.cmd == "sync":
+            prepare(*args.items)
+        elif args.cmd == "status":
+            items = pending_list()
+            for item in items:
+                print(f"  {item['subject']}/{item['lesson']}  {item['built_at']} ({item.get('builds', 1)} 回)  {', '.join(item['outputs'])}")
+            print(f"🪞 反映待ち: {len(items)} 件")
+        elif args.cmd == "publish":
+            start = time.perf_counter()
+            items = pending_list(args.subject, args.lesson)
+            for item in items:
+                n = publish(item)
+                print(f"📤 {item['subject']}/{item['lesson']}: {n} ファイル → NAS")
+            print(f"✅ 反映完了: {len(items)} 件 ({time.perf_counter() - start:.2f}秒)")
+    except BuildError as e:
+        print_error(e); sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
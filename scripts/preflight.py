@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+
+# preflight.py — LaTeX を実行する前の静的チェック（数ミリ秒で終わるもの）
+#
+#   python preflight.py 1020701 02
+#
+# lualatex を 30 秒以上待ってから分かる単純な誤りを先に見つける。
+#  ・\begin{frame} / \end{frame} の対応（入れ子・閉じ忘れ・余分な \end）
+#  ・templates/emoji_macros.tex に定義のない \emj マクロ、定義先の画像がないマクロ
+#  ・graphicspath（images/、ツールの画像、絵文字画像）に見つからない \includegraphics
+#  ・1行目のテーマ指定 @@@--(テーマ)--@@@ の書き間違い（黙って SimpleDarkBlue になる）
+# コメントと verbatim 系の環境の中は調べない。行番号は content.tex の行番号。
+from __future__ import annotations
+
+import argparse
+import re
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from builderrors import BuildError, print_error
+
+THEMES = ("metropolis", "SimpleDarkBlue")
+IMAGE_EXTS = (".png", ".pdf", ".jpg", ".jpeg", ".eps")
+
+_COMMENT_RE = re.compile(r"(?<!\\)%.*$", re.MULTILINE)
+_VERBATIM_RE = re.compile(r"\\begin\{(lstlisting|verbatim|minted|Verbatim)\}.*?\\end\{\1\}", re.DOTALL)
+_FRAME_RE = re.compile(r"\\(begin|end)\{frame\}")
+_EMJ_RE = re.compile(r"\\(emj[A-Za-z]+)")
+_IMG_RE = re.compile(r"\\includegraphics(?:<[^>]*>)?(?:\[[^\]]*\])?\{([^}]*)\}")
+_MACRO_DEF_RE = re.compile(r"\\(?:re)?newcommand\{?\\(emj[A-Za-z]+)\}?(.*)$", re.MULTILINE)
+_THEME_RE = re.compile(r"@@@--\((.*?)\)--@@@")
+
+
+@dataclass
+class Issue:
+    line: int
+    message: str
+
+    def __str__(self) -> str:
+        return f"l.{self.line}: {self.message}"
+
+
+def _blank(m: re.Match) -> str:
+    """行番号がずれないよう、改行だけ残して消す"""
+    return re.sub(r"[^\n]", " ", m.group(0))
+
+
+def _line_of(text: str, pos: int) -> int:
+    return text.count("\n", 0, pos) + 1
+
+
+def emoji_table(macro_file: Path) -> dict[str, str]:
+    """emoji_macros.tex から {マクロ名: 画像ファイル名} を作る"""
+    table = {}
+    for name, rest in _MACRO_DEF_RE.findall(macro_file.read_text(encoding="utf-8")):
+        m = _IMG_RE.search(rest)
+        table[name] = m.group(1) if m else ""
+    return table
+
+
+def find_image(name: str, dirs: list[Path], lesson_dir: Path | None = None) -> Path | None:
+    """
+    graphicx と同じく、拡張子がなければ IMAGE_EXTS を順に試す。
+    TeX のカレント（ビルドフォルダ）には講義フォルダの images/ だけがコピーされるので、
+    lesson_dir を渡すと images/... の名前はまず講義フォルダから探す。
+    """
+    names = [name] if Path(name).suffix.lower() in IMAGE_EXTS else [name + ext for ext in IMAGE_EXTS]
+    if lesson_dir is not None and Path(name).parts[:1] == ("images",):
+        dirs = [lesson_dir, *dirs]
+    for d in dirs:
+        for n in names:
+            if (d / n).exists():
+                return d / n
+    return None
+
+
+def frame_images(frame_tex: str, image_dirs: list[Path], emoji_dirs: list[Path],
+                 emoji_macros: dict[str, str], lesson_dir: Path | None = None) -> list[Path]:
+    """フレームが使う画像（\\includegraphics と \\emj マクロの画像）のうち、見つかったもののパス"""
+    body = _COMMENT_RE.sub("", frame_tex)
+    found = [find_image(name.strip(), image_dirs, lesson_dir) for name in _IMG_RE.findall(body) if "\\" not in name]
+    found += [find_image(emoji_macros[name], emoji_dirs) for name in _EMJ_RE.findall(body) if emoji_macros.get(name)]
+    return [p for p in found if p]
+
+
+def check_theme(first_line: str) -> list[Issue]:
+    m = _THEME_RE.search(first_line)
+    if m:
+        val = m.group(1).strip()
+        if val not in THEMES:
+            return [Issue(1, f"テーマ名が不明です: {val!r}（{' / '.join(THEMES)}）→ SimpleDarkBlue で出力されます")]
+    elif "@@@" in first_line or "--(" in first_line:
+        return [Issue(1, f"テーマ指定の書式が違います: {first_line.strip()!r}（正: %@@@--(metropolis)--@@@）")]
+    return []
+
+
+def check_frames(text: str) -> list[Issue]:
+    issues, open_at = [], None
+    for m in _FRAME_RE.finditer(text):
+        line = _line_of(text, m.start())
+        if m.group(1) == "begin":
+            if open_at is not None:
+                issues.append(Issue(open_at, f"\\begin{{frame}} が閉じられないまま l.{line} で次のフレームが始まっています"))
+            open_at = line
+        elif open_at is None:
+            issues.append(Issue(line, "対応する \\begin{frame} のない \\end{frame} があります"))
+        else:
+            open_at = None
+    if open_at is not None:
+        issues.append(Issue(open_at, "\\begin{frame} が閉じられていません"))
+    return issues
+
+
+def check_emoji(text: str, table: dict[str, str], emoji_dirs: list[Path]) -> list[Issue]:
+    issues, seen = [], set()
+    for m in _EMJ_RE.finditer(text):
+        name = m.group(1)
+        if name in seen: continue
+        seen.add(name)
+        if name not in table:
+            issues.append(Issue(_line_of(text, m.start()), f"未定義の絵文字マクロです: \\{name}"))
+        elif table[name] and not find_image(table[name], emoji_dirs):
+            issues.append(Issue(_line_of(text, m.start()), f"\\{name} の画像がありません: {table[name]}"))
+    return issues
+
+
+def check_images(text: str, image_dirs: list[Path], macro_dirs: dict[str, Path],
+                 lesson_dir: Path | None = None) -> list[Issue]:
+    """macro_dirs は \\pgfpath のようにパスに展開されるマクロ（{名前: フォルダ}）"""
+    issues = []
+    for m in _IMG_RE.finditer(text):
+        name, dirs, base = m.group(1).strip(), image_dirs, lesson_dir
+        for macro, d in macro_dirs.items():
+            if name.startswith("\\" + macro):
+                name, dirs, base = name[len(macro) + 1:].lstrip("{}/ "), [d], None
+                break
+        if "\\" in name or "#" in name: continue  # その他のマクロは展開できないので調べない
+        if not find_image(name, dirs, base):
+            issues.append(Issue(_line_of(text, m.start()), f"画像が見つかりません: {name}"))
+    return issues
+
+
+def run(text: str, *, image_dirs: list[Path], emoji_dirs: list[Path], emoji_macros: dict[str, str],
+        macro_dirs: dict[str, Path] | None = None, lesson_dir: Path | None = None) -> list[Issue]:
+    """content.tex の全文を調べて問題を行番号順に返す。lesson_dir は find_image を参照"""
+    body = _VERBATIM_RE.sub(_blank, _COMMENT_RE.sub(lambda m: " " * len(m.group(0)), text))
+    issues = check_theme(text.split("\n", 1)[0])
+    issues += check_frames(body)
+    issues += check_emoji(body, emoji_macros, emoji_dirs)
+    issues += check_images(body, image_dirs, macro_dirs or {}, lesson_dir)
+    return sorted(issues, key=lambda i: i.line)
+
+
+def check_lesson(content_path: Path) -> list[Issue]:
+    """授業フォルダの content.tex を、ビルド時と同じ画像の探索パスで調べる"""
+    import build_slides1
+
+    app_dir = content_path.parent
+    return run(content_path.read_text(encoding="utf-8"),
+               image_dirs=build_slides1.graphics_dirs(app_dir),
+               emoji_dirs=[build_slides1.EMOJI_IMG_DIR],
+               emoji_macros=emoji_table(build_slides1.TEMPLATE_DIR / "emoji_macros.tex"),
+               macro_dirs={"pgfpath": app_dir / "images"}, lesson_dir=app_dir)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="LaTeX を実行する前に content.tex を静的にチェックする")
+    ap.add_argument("items", nargs=2, help="科目コード ディレクトリ名")
+    args = ap.parse_args()
+
+    import build_slides1
+
+    subj_code, tdir_name = args.items
+    try:
+        tagdir = build_slides1.lesson_dir(subj_code, tdir_name)
+        if not tagdir: sys.exit(1)
+        content_path = Path(build_slides1.get_sourcedir()) / tagdir / "content.tex"
+    except BuildError as e:
+        print_error(e); sys.exit(1)
+    if not content_path.exists():
+        print(f"❌ content.tex がありません: {content_path}", file=sys.stderr); sys.exit(1)
+
+    start = time.perf_counter()
+    issues = check_lesson(content_path)
+    for issue in issues:
+        print(f"  {content_path.name}:{issue}")
+    elapsed = (time.perf_counter() - start) * 1000
+    if issues:
+        print(f"❌ 事前チェック: {len(issues)} 件の問題 ({elapsed:.1f}ms)", file=sys.stderr); sys.exit(1)
+    print(f"✅ 事前チェック OK ({elapsed:.1f}ms)")
+
+
+if __name__ == "__main__":
+    main()
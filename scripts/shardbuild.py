@@ -0,0 +1,175 @@
+# shardbuild.py — 1つのデッキをフレーム単位で分割し、並列にコンパイルして結合する（--shards N）
+#
+# ・各分割は同じプリアンブル（配備済みのサブファイル）で、別々のフォルダでコンパイルする
+# ・表紙は先頭の分割だけに含める。最初のフレームより前の記述（\newcommand など）は全分割に入れる
+# ・各分割の先頭でフレーム番号・ページ番号・総フレーム数を設定して、通し番号と
+#   \ensureoddslide の奇偶判定が分割しない場合と同じになるようにする
+# ・ページ数はコンパイル前には見積もりなので、コンパイル後の実ページ数で確かめ、
+#   奇偶がずれた分割は（奇数ページ開始を使っている場合だけ）正しい値で再コンパイルする
+# ・結合した main.pdf と、各分割の .nav をつなげた main.nav を build_dir に書く
+from __future__ import annotations
+
+import contextvars
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import beamernav
+from builderrors import BuildError, LatexError, MissingDependencyError
+
+try:
+    import pymupdf
+except ImportError:
+    pymupdf = None
+
+_TITLE_RE = re.compile(r"%@@TITLE_BEGIN@@.*?%@@TITLE_END@@\n?", re.DOTALL)
+_PAUSE_RE = re.compile(r"\\pause\b")
+_MYPAUSE_RE = re.compile(r"\\mypause\b")
+_NOTE_RE = re.compile(r"\\noteT?\b")
+# 中扉 (\AtBeginSection) を作るので、先頭の分割以外には複製しない
+_SECTION_RE = re.compile(r"\\(?:part|section|subsection|subsubsection)\*?(?:\[[^\]]*\])?\{[^{}]*\}")
+
+
+def split_body(body: str, positions: list[tuple[int, int]], n: int) -> list[tuple[str, list[str]]]:
+    """
+    body をフレーム境界で n 個に分ける。フレーム間の記述（\\section など）は直後のフレームと同じ分割に入れる。
+    最初のフレームより前の記述（マクロの定義など）は、\\section 類を除いて2番目以降の分割の先頭にも入れる。
+    戻り値は (分割の本文, その分割のフレームのソース) のリスト。
+    """
+    n = max(1, min(n, len(positions)))
+    size, extra = divmod(len(positions), n)
+    shared = _SECTION_RE.sub("", body[:positions[0][0]]) if positions else ""
+    chunks, start, i = [], 0, 0
+    for k in range(n):
+        cnt = size + (1 if k < extra else 0)
+        frames = positions[i:i + cnt]
+        end = frames[-1][1] if k < n - 1 else len(body)
+        chunks.append(((shared if k > 0 else "") + body[start:end], [body[a:b] for a, b in frames]))
+        start, i = end, i + cnt
+    return chunks
+
+
+def _numbered(frame_tex: str) -> int:
+    head = frame_tex.split("\n", 1)[0]
+    return 0 if "noframenumbering" in head else 1
+
+
+def _estimate_pages(frame_tex: str, *, ho: bool, tech: bool) -> int:
+    """
+    教師用 (tech) は handout クラスなのでオーバーレイがなく、ノートがあればノートのページが付く。
+    配布用 (ho) は \\mypause が無効になる。
+    """
+    if tech:
+        return 1 + (1 if _NOTE_RE.search(frame_tex) else 0)
+    pauses = len(_PAUSE_RE.findall(frame_tex))
+    return 1 + pauses + (0 if ho else len(_MYPAUSE_RE.findall(frame_tex)))
+
+
+def _shard_tex(tex_main: str, body: str, k: int, frame_no: int, page_no: int, total_frames: int) -> str:
+    tex = tex_main if k == 0 else _TITLE_RE.sub("", tex_main)
+    setup = rf"\gdef\inserttotalframenumber{{{total_frames}}}"
+    if k > 0:
+        setup = rf"\setcounter{{framenumber}}{{{frame_no}}}\setcounter{{page}}{{{page_no}}}" + setup
+    return tex.replace("%@@shardsetup@@", setup).replace("@@BODY@@", body)
+
+
+def _compile(run_latexmk, shard_dir: Path, tex: str) -> tuple[int, int]:
+    """(ページ数, パス数) を返す"""
+    main_tex = shard_dir / "main.tex"
+    main_tex.write_text(tex, encoding="utf-8")
+    passes = run_latexmk(shard_dir, main_tex)
+    try:
+        with pymupdf.open(shard_dir / "main.pdf") as d:
+            return d.page_count, passes
+    except (RuntimeError, FileNotFoundError) as e:  # PyMuPDF の例外は RuntimeError
+        raise LatexError(f"{shard_dir.name} の PDF を開けません: {e}", shard_dir) from e
+
+
+def compile_sharded(build_dir: Path, tex_main: str, body: str, positions: list[tuple[int, int]],
+                    n: int, sub_files: dict[str, str], run_latexmk, *, ho: bool, tech: bool) -> int:
+    """
+    body を n 分割して並列にコンパイルし、build_dir/main.pdf と main.nav を作る。
+    run_latexmk は build_slides1.run_latexmk（失敗時は LatexError を送出する）。
+    ho / tech は apply_modes_to_template に渡したモード。奇数ページ開始 (\\ensureoddslide) は教師用だけ。
+    戻り値は各分割のパス数の最大値。
+    """
+    if pymupdf is None:
+        raise MissingDependencyError("分割ビルドには PyMuPDF が必要です: pip install pymupdf")
+
+    chunks = split_body(body, positions, n)
+    total_frames = sum(_numbered(f) for _, frames in chunks for f in frames)
+
+    # 分割ごとのフレーム番号（確定）とページ番号（見積もり）の初期値
+    frame_seeds, page_seeds = [], []
+    fno, pno = 0, 2  # 表紙が 1 ページ目
+    for _, frames in chunks:
+        frame_seeds.append(fno); page_seeds.append(pno)
+        fno += sum(_numbered(f) for f in frames)
+        pno += sum(_estimate_pages(f, ho=ho, tech=tech) for f in frames)
+
+    shard_dirs = []
+    for k in range(len(chunks)):
+        d = build_dir / f"shard{k:02d}"
+        d.mkdir(exist_ok=True)
+        for name, content in sub_files.items():
+            (d / name).write_text(content, encoding="utf-8")
+        img = d / "images"
+        if not img.exists() and (build_dir / "images").exists():
+            img.symlink_to(build_dir / "images", target_is_directory=True)
+        shard_dirs.append(d)
+
+    def run(k: int) -> tuple[int, int]:
+        tex = _shard_tex(tex_main, chunks[k][0], k, frame_seeds[k], page_seeds[k], total_frames)
+        return _compile(run_latexmk, shard_dirs[k], tex)
+
+    start = time.perf_counter()
+    workers = min(len(chunks), os.cpu_count() or 1)
+    print(f"🧩 分割ビルド: {len(chunks)} shards / {workers} workers / {sum(len(f) for _, f in chunks)} frames")
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        # 常駐サーバーでは出力の送り先がコンテキストにあるので、コピーを渡して実行する
+        futures = [ex.submit(contextvars.copy_context().run, run, k) for k in range(len(chunks))]
+        page_counts, passes = map(list, zip(*(f.result() for f in futures)))
+
+    # 実ページ数から正しいページ番号を求め、奇偶がずれた分割を作り直す
+    pno = 1 + page_counts[0]
+    for k in range(1, len(chunks)):
+        if pno != page_seeds[k]:
+            if tech and (pno - page_seeds[k]) % 2:
+                print(f"🔁 shard{k:02d}: ページの奇偶がずれたため再コンパイルします ({page_seeds[k]} → {pno})")
+                page_seeds[k] = pno
+                page_counts[k], passes[k] = run(k)
+            else:
+                page_seeds[k] = pno
+        pno += page_counts[k]
+
+    # 結合
+    try:
+        out = pymupdf.open()
+        for d in shard_dirs:
+            with pymupdf.open(d / "main.pdf") as src:
+                out.insert_pdf(src)
+        out.save(build_dir / "main.pdf", garbage=3, deflate=True)
+        out.close()
+    except RuntimeError as e:
+        raise BuildError(f"分割した PDF の結合に失敗しました: {e}") from e
+
+    # 各分割の .nav とフレームの印のページを通しのページ番号に直してつなげる
+    lines, marks = [], {}
+    for k, d in enumerate(shard_dirs):
+        nav = d / "main.nav"
+        if not nav.exists(): continue
+        base = 1 if k == 0 else page_seeds[k]
+        pages = beamernav.frame_pages(nav)
+        offset = base - pages[0][0] if pages and k > 0 else 0
+        lines += [rf"\headcommand {{\beamer@framepages {{{a + offset}}}{{{b + offset}}}}}" for a, b in pages]
+        marks.update({i: p + offset for i, p in beamernav.read_marks(d).items()})
+    lines.append(rf"\headcommand {{\beamer@documentpages {{{pno - 1}}}}}")
+    (build_dir / "main.nav").write_text("\n".join(lines) + "\n", encoding="utf-8")
+    if marks:
+        (build_dir / beamernav.MARKS_FILE).write_text("".join(f"{i}\t{p}\n" for i, p in sorted(marks.items())),
+                                                      encoding="utf-8")
+
+    print(f"🧩 分割ビルド完了: {pno - 1} pages ({time.perf_counter() - start:.3f}秒)")
+    return max(passes)
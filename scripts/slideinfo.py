@@ -2,10 +2,13 @@
 from __future__ import annotations
 
 import sys
+import threading
 from pathlib import Path
 from datetime import datetime
 from typing import Any
 
+from builderrors import SlideInfoError
+
 
 # ============================================================
 # Path settings
@@ -44,27 +47,27 @@ except ImportError as e:
     sys.exit(1)
 
 
+# 常駐ビルドサーバーから並行に呼ばれたとき、同じ slideinfo.yaml を
+# 同時に書き換えないようにするためのロック
+_LEDGER_LOCK = threading.Lock()
+
+
 # ============================================================
 # Error helper
 # ============================================================
 
-def _exit_with_error(message: str) -> None:
-    """
-    build_slide 用のエラー終了。
-    旧 slideinfo.py と同じように、エラーを表示して終了する。
-    """
-    print(f"❌ エラー: {message}", file=sys.stderr)
-    sys.exit(1)
-
-
 def _safe_call(func, *args, **kwargs):
     """
-    utils.py 側で発生した例外を、build_slide 用のメッセージにして終了する。
+    utils.py 側で発生した例外を、build_slide 用の SlideInfoError にして送出する。
+    （以前はエラーを表示して終了していたが、ライブラリとして使えるように例外にした。
+      表示と終了はコマンドライン側の builderrors.print_error が行う）
     """
     try:
         return func(*args, **kwargs)
+    except SlideInfoError:
+        raise
     except Exception as e:
-        _exit_with_error(str(e))
+        raise SlideInfoError(str(e)) from e
 
 
 # ============================================================
@@ -109,9 +112,27 @@ def slidetitle(subject: str, course: str) -> str:
     return _safe_call(get_lesson_title, subject, course)
 
 
-def slideinfoupdate(subject: str, course: str) -> None:
+def slidelist(subject: str) -> list[tuple[str, str]]:
+    """
+    科目別 slideinfo.yaml に登録されている授業回を、台帳の記載順に
+    (授業回, title) のリストで返す。title のない項目は含めない。
+    """
+    try:
+        fsyear = get_current_fsyear()
+        slideinfo_data, _subject_dir = load_slideinfo_by_subno(subject, fsyear)
+        return [
+            (str(course).zfill(2), str(data["title"]))
+            for course, data in slideinfo_data.items()
+            if isinstance(data, dict) and data.get("title")
+        ]
+    except Exception as e:
+        raise SlideInfoError(str(e)) from e
+
+
+def slideinfoupdate(subject: str, course: str, builds: int = 1) -> None:
     """
     科目別 slideinfo.yaml の created_at / update_at / count を更新する。
+    builds はまとめて記録するビルド回数（ミラーからの publish では反映待ちの間のビルド数）。
 
     旧 slideinfo.py の slideinfoupdate() 相当。
 
@@ -124,42 +145,43 @@ def slideinfoupdate(subject: str, course: str) -> None:
       created_at: '2026-03-17 12:45:28'
       update_at: '2026-05-06 07:36:16'
     """
-    try:
-        fsyear = get_current_fsyear()
-        slideinfo_data, subject_dir = load_slideinfo_by_subno(subject, fsyear)
+    with _LEDGER_LOCK:
+        _safe_call(_update_ledger, subject, course, builds)
 
-        course = str(course).zfill(2)
 
-        course_data = get_required_key(
-            slideinfo_data,
-            course,
-            f"slideinfo.yaml の授業回設定({course})",
-        )
+def _update_ledger(subject: str, course: str, builds: int = 1) -> None:
+    fsyear = get_current_fsyear()
+    slideinfo_data, subject_dir = load_slideinfo_by_subno(subject, fsyear)
 
-        if not isinstance(course_data, dict):
-            raise TypeError(f"授業回設定({course}) がdict形式ではありません。")
+    course = str(course).zfill(2)
 
-        dt = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        count = course_data.get("count", 0)
+    course_data = get_required_key(
+        slideinfo_data,
+        course,
+        f"slideinfo.yaml の授業回設定({course})",
+    )
 
-        try:
-            count = int(count)
-        except Exception:
-            count = 0
+    if not isinstance(course_data, dict):
+        raise TypeError(f"授業回設定({course}) がdict形式ではありません。")
 
-        if not course_data.get("created_at"):
-            course_data["created_at"] = dt
-        else:
-            course_data["update_at"] = dt
+    dt = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    count = course_data.get("count", 0)
 
-        course_data["count"] = count + 1
+    try:
+        count = int(count)
+    except Exception:
+        count = 0
 
-        save_slideinfo(subject_dir, slideinfo_data)
+    if not course_data.get("created_at"):
+        course_data["created_at"] = dt
+    else:
+        course_data["update_at"] = dt
 
-        print(f"✅ 台帳更新完了: {subject}/{course} (Count: {course_data['count']})")
+    course_data["count"] = count + builds
 
-    except Exception as e:
-        _exit_with_error(str(e))
+    save_slideinfo(subject_dir, slideinfo_data)
+
+    print(f"✅ 台帳更新完了: {subject}/{course} (Count: {course_data['count']})")
 
 
 # ============================================================
@@ -175,11 +197,8 @@ def readslideyaml() -> dict[str, Any]:
 
     ただし build_slides1.py からは通常使わない。
     """
-    try:
-        from utils import load_dirinfo
-        return load_dirinfo()
-    except Exception as e:
-        _exit_with_error(str(e))
+    from utils import load_dirinfo
+    return _safe_call(load_dirinfo)
 
 
 # ============================================================
@@ -0,0 +1,132 @@
+# thumbnails.py — ビルド後の PDF からページのサムネイルを作る
+#
+# ・ラスタライズはローカルの pdftoppm (poppler) を並列に呼び出す
+# ・サムネイルはフレーム内容のハッシュをファイル名にして保存し、
+#   内容が変わっていないフレームのページは作り直さない（成果物ストアにもあれば、そこから取る）
+# ・project_assets/html/contact_sheet.html で一覧にするための manifest.json を書く
+from __future__ import annotations
+
+import contextvars
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import beamernav
+import localcache
+from builderrors import BuildError
+
+THUMB_WIDTH = 320
+
+
+def frame_key(*parts: str) -> str:
+    """フレームの見た目を決める要素（フレーム本文・テンプレート・番号など）からキーを作る"""
+    h = hashlib.sha256()
+    for p in parts:
+        h.update(p.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()[:20]
+
+
+def _rasterize(pdf: Path, page: int, dst: Path) -> None:
+    # pdftoppm は <出力名>.png を書くので、一時名で書いてから置き換える
+    tmp_base = localcache.tmp_path(dst)
+    cmd = ["pdftoppm", "-png", "-singlefile", "-scale-to", str(THUMB_WIDTH),
+           "-f", str(page), "-l", str(page), str(pdf), str(tmp_base)]
+    try:
+        subprocess.run(cmd, check=True, capture_output=True, text=True, errors="replace")
+    except subprocess.CalledProcessError as e:
+        raise BuildError(f"サムネイルの作成に失敗しました (page {page}): {e.stderr.strip() or e}") from e
+    os.replace(f"{tmp_base}.png", dst)
+
+
+def export_thumbnails(pdf: Path, nav: Path, out_dir: Path, frames: list[dict],
+                      workers: int | None = None) -> Path | None:
+    """
+    pdf の各ページのサムネイルを out_dir に作り、manifest.json のパスを返す。
+
+    frames は文書順（表紙を含む）のフレーム情報で、各要素は
+    {"key": frame_key(...), "title": str, "line": int} の形。
+    nav のフレームとは beamernav.mark_frames() の印 (frame_marks.tsv) で対応させる。
+    対応しないフレーム（中扉などマクロが追加したもの）だけ PDF ごとのキーにし、キャッシュは使わない。
+    """
+    if not shutil.which("pdftoppm"):
+        print("⚠️ pdftoppm が見つからないためサムネイル作成をスキップします (brew install poppler)")
+        return None
+    if not nav.exists():
+        print(f"⚠️ {nav.name} が見つからないためサムネイル作成をスキップします")
+        return None
+
+    start = time.perf_counter()
+    pages = beamernav.frame_pages(nav)
+    marks = beamernav.read_marks(nav.parent)
+    if marks:
+        owner = beamernav.match_frames(pages, marks)
+    else:  # 印がない（古いビルド）ときは、数が一致する場合だけ順に対応させる
+        owner = list(range(len(pages))) if len(pages) == len(frames) else [None] * len(pages)
+    if None in owner:
+        pdf_key = frame_key(str(pdf.stat().st_mtime_ns), str(pdf.stat().st_size))
+    frames = [frames[o] if o is not None and o < len(frames) else {"key": frame_key(pdf_key, str(i)), "title": "", "line": 0}
+              for i, o in enumerate(owner)]
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    store = localcache.ArtifactStore()
+    entries, jobs, reused = [], [], 0
+    for i, ((first, last), info) in enumerate(zip(pages, frames)):
+        thumbs = []
+        for k, page in enumerate(range(first, last + 1)):
+            name = f"{info['key']}_{k:02d}.png"
+            thumbs.append(name)
+            if (out_dir / name).exists(): continue
+            if store.fetch("thumbs", name, out_dir / name):
+                reused += 1
+            else:
+                jobs.append((page, out_dir / name))
+        entries.append({"index": i, "title": info.get("title", ""), "line": info.get("line", 0),
+                        "pages": list(range(first, last + 1)), "thumbs": thumbs})
+
+    if jobs:
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 4) as ex:
+            for f in [ex.submit(contextvars.copy_context().run, _rasterize, pdf, page, dst) for page, dst in jobs]:
+                f.result()
+        for _page, dst in jobs:
+            store.put_file("thumbs", dst.name, dst)
+
+    # 参照されなくなったサムネイルを削除
+    used = {name for e in entries for name in e["thumbs"]}
+    for p in out_dir.glob("*.png"):
+        if p.name not in used:
+            p.unlink()
+
+    manifest = {
+        "pdf": pdf.name,
+        "generated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "thumb_width": THUMB_WIDTH,
+        "frames": entries,
+    }
+    manifest_path = out_dir / "manifest.json"
+    tmp = localcache.tmp_path(manifest_path)
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp, manifest_path)
+
+    total = sum(len(e["thumbs"]) for e in entries)
+    print(f"🖼️ サムネイル: {len(jobs)} / {total} ページを作成, {reused} ページをキャッシュから"
+          f" ({time.perf_counter() - start:.2f}秒) → {out_dir}")
+    return manifest_path
+
+
+if __name__ == "__main__":
+    # 単体実行: python thumbnails.py main.pdf main.nav 出力フォルダ
+    if len(sys.argv) != 4:
+        print("usage: thumbnails.py PDF NAV OUT_DIR", file=sys.stderr); sys.exit(2)
+    pdf_path, nav_path, out = map(Path, sys.argv[1:])
+    n = len(beamernav.frame_pages(nav_path))
+    key = frame_key(str(pdf_path.resolve()), str(pdf_path.stat().st_mtime_ns))
+    export_thumbnails(pdf_path, nav_path, out,
+                      [{"key": frame_key(key, str(i)), "title": "", "line": 0} for i in range(n)])